@@ -0,0 +1,237 @@
+##### import #####
+import os
+import sys
+import importlib.util
+
+#### info ####
+__author__ = "wangzhsi"
+__mail__ = "wang_zsi@outlook.com"
+__date__ = "20261019"
+__version__ = "1.0"
+
+#### main ####
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子命令: (目录, 脚本, 说明); 脚本只在子命令运行时导入
+COMMANDS = {
+    "convert_agp": ("convert_agp", "convert_agp.py", "convert agp between 4 and 9 columns"),
+    "fish_gff": ("fish_gff", "fish_del_gff.py", "fish or delete genes/mrnas from gff"),
+    "coverage": ("depth_coverage_stat", "coverage_percentages.py", "coverage percentages of depth file"),
+    "yahs-format": ("format_agp_from_Yahs", "format_agp_from_Yahs.py", "split log/bed and agp4 from yahs agp"),
+    "ena": ("parse_ena_json", "parse_ena_json.py", "parse ena metadata and download fastq"),
+    "common": ("get_common", "get_common.py", "intersect/union/difference/count of lists"),
+    "fasta_stat": ("fasta_stat", "fasta_stat.py", "base/N50/gap statistics of genome fasta"),
+    "pan_core": ("orthoPanCore_visualization", "pan_core_simulation.py", "pan/core curve simulation (numpy)"),
+}
+
+USAGE = f"""usage: biotool.py <command> [args ...]
+       biotool.py serve [-s SOCKET]
+       biotool.py client -s SOCKET <command> [args ...]
+
+commands:
+{chr(10).join(f"  {name:<12} {info[2]}" for name, info in COMMANDS.items())}
+  serve        run jobs from stdin or a unix socket without restarting python
+  client       send one job to a running server
+
+author: {__author__}
+mail: {__mail__}
+date: {__date__}
+version: {__version__}"""
+
+
+def load(command):
+    """按路径导入子命令脚本, 以脚本名注册到 sys.modules, 多进程子进程可按名称导入"""
+    directory, script, _ = COMMANDS[command]
+    name = os.path.splitext(script)[0]
+    if name in sys.modules:
+        return sys.modules[name]
+    path = os.path.join(ROOT, directory, script)
+    sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run(command, argv) -> int:
+    """运行子命令的 main(), 返回退出码"""
+    if command not in COMMANDS:
+        print(f"biotool: unknown command '{command}'\n\n{USAGE}", file=sys.stderr)
+        return 2
+    module = load(command)
+    sys.argv = [f"biotool {command}"] + list(argv)
+    try:
+        module.main()
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+
+def execute(job) -> dict:
+    """
+    在 fork 出的子进程中运行一个任务, 子命令的全局状态不会影响后续任务;
+    已导入的模块由父进程继承, 无需重新导入
+    job: {"args": [command, ...], "cwd": 工作目录, "id": 任意值}
+    """
+    import time
+    import tempfile
+    import traceback
+
+    start = time.perf_counter()
+    args = job.get("args") or []
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                devnull = os.open(os.devnull, os.O_RDONLY)
+                os.dup2(devnull, 0)
+                os.dup2(out.fileno(), 1)
+                os.dup2(err.fileno(), 2)
+                if job.get("cwd"):
+                    os.chdir(job["cwd"])
+                code = run(args[0], args[1:]) if args else 2
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        out.seek(0)
+        err.seek(0)
+        return {
+            "id": job.get("id"),
+            "returncode": os.waitstatus_to_exitcode(status),
+            "stdout": out.read().decode(errors="replace"),
+            "stderr": err.read().decode(errors="replace"),
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+
+
+def parse_job(line: str) -> dict:
+    """一行一个任务: json 对象, 或与命令行相同的字符串 (如 'coverage --depth_file a.txt ...')"""
+    import json
+    import shlex
+
+    line = line.strip()
+    if line.startswith("{"):
+        return json.loads(line)
+    return {"args": shlex.split(line)}
+
+
+def serve_lines(rfile, wfile):
+    """逐行读取任务并写出 json 结果"""
+    import json
+
+    for line in rfile:
+        if isinstance(line, bytes):
+            line = line.decode()
+        if not line.strip():
+            continue
+        try:
+            job = parse_job(line)
+        except ValueError as e:
+            result = {"id": None, "returncode": 2, "stdout": "", "stderr": f"invalid job: {e}\n"}
+        else:
+            result = execute(job)
+        data = json.dumps(result) + "\n"
+        # 文本流 (stdout) 直接写出, socket 需写出 bytes
+        wfile.write(data if hasattr(wfile, "encoding") else data.encode())
+        wfile.flush()
+
+
+def serve(argv) -> int:
+    import signal
+    import argparse
+    import socketserver
+
+    parser = argparse.ArgumentParser(
+        prog="biotool serve",
+        description="run jobs without restarting python: one job per line, one json result per line",
+    )
+    parser.add_argument("-s", "--socket", help="listen on this unix socket instead of stdin/stdout")
+    parser.add_argument(
+        "--lazy", action="store_true", default=False, help="import subcommands on first use, not at startup"
+    )
+    args = parser.parse_args(argv)
+
+    # 任务执行用到的模块预先导入, fork 出的进程直接继承
+    import json, time, shlex, tempfile, traceback  # noqa: E401,F401
+
+    if not args.lazy:
+        for command in COMMANDS:
+            try:
+                load(command)
+            except ImportError as e:  # 缺少可选依赖 (如 numpy) 的子命令在运行时再报错
+                sys.modules.pop(os.path.splitext(COMMANDS[command][1])[0], None)
+                print(f"biotool: skip preloading {command}: {e}", file=sys.stderr)
+    if not args.socket:
+        serve_lines(sys.stdin, sys.stdout)
+        return 0
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            serve_lines(self.rfile, self.wfile)
+
+    class Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+        pass
+
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # kill 时同样删除 socket 文件
+    with Server(args.socket, Handler) as server:
+        print(f"biotool: serving on {args.socket}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(args.socket)
+    return 0
+
+
+def client(argv) -> int:
+    """
+    只依赖 json 及 socket, 不使用 argparse, 减少客户端启动时间;
+    也可不经 python, 直接向 socket 写入一行任务, 如: echo 'coverage ...' | nc -U SOCKET
+    """
+    import json
+    import socket
+
+    if len(argv) < 3 or argv[0] not in ("-s", "--socket"):
+        print("usage: biotool.py client -s SOCKET <command> [args ...]", file=sys.stderr)
+        return 2
+    path, args = argv[1], argv[2:]
+
+    job = {"args": args, "cwd": os.getcwd()}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall((json.dumps(job) + "\n").encode())
+        sock.shutdown(socket.SHUT_WR)
+        result = json.loads(sock.makefile("rb").readline())
+    sys.stdout.write(result["stdout"])
+    sys.stderr.write(result["stderr"])
+    return result["returncode"]
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help"):
+        print(USAGE)
+        return 0 if len(sys.argv) >= 2 else 2
+    command, argv = sys.argv[1], sys.argv[2:]
+    if command == "serve":
+        return serve(argv)
+    if command == "client":
+        return client(argv)
+    return run(command, argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
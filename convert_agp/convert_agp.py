@@ -1,8 +1,16 @@
+import os
 import re
+import sys
 import argparse
+import multiprocessing
 
 from collections import defaultdict, OrderedDict
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "standard_module"))
+from my_file_io import open_input, open_output  # noqa: E402
+from my_metrics import add_metrics_arguments, file_size, metrics_from_args  # noqa: E402
+from my_fasta import open_fasta  # noqa: E402
+
 
 def _safe_int(value) -> int | None:
     try:
@@ -28,7 +36,7 @@ def get_size_dict(input_file: str) -> dict:
     get contig size dictionary from input file, ctg\tsize
     """
     size_dict = {}
-    with open(input_file) as f:
+    with open_input(input_file) as f:
         for line in f:
             line = line.strip()
             if not line or line.startswith("#"):
@@ -49,7 +57,7 @@ def get_id_relation_dict(input_file: str) -> dict:
     get id relation dictionary from input file, id\tnew_id
     """
     id_relation_dict = {}
-    with open(input_file) as f:
+    with open_input(input_file) as f:
         for line in f:
             line = line.strip()
             if not line or line.startswith("#"):
@@ -84,7 +92,7 @@ class AGPParser:
 
     def _read_line(self):
         valid_lines = []
-        with open(self.agp_file) as f:
+        with open_input(self.agp_file) as f:
             for line in f:
                 if not line or line.startswith("#"):
                     continue
@@ -372,6 +380,89 @@ def format_9col_agp(contigs: list, size_dict: dict, gap_size: int) -> list:
     return processed
 
 
+_scan = {}  # 子进程中的 fasta 路径及 N 区间正则, 由 _init_scan 设置
+
+
+def _init_scan(fasta: str, min_gap: int):
+    _scan["fasta"] = fasta
+    _scan["pattern"] = re.compile(rb"[Nn]{%d,}" % min_gap)
+
+
+def _scan_scaffold(name: str) -> tuple:
+    """
+    return: (scaffold, length, [(gap_start, gap_end), ...]), 0-based 左闭右开
+    """
+    seq = open_fasta(_scan["fasta"]).fetch_bytes(name)
+    return name, len(seq), [m.span() for m in _scan["pattern"].finditer(seq)]
+
+
+def scan_fasta_gaps(fasta: str, min_gap: int = 10, processes: int = 1):
+    """
+    逐条 scaffold 查找长度 >= min_gap 的 N 区间, 按 fasta 中的顺序产出;
+    序列经 .fai 索引及 mmap 读取, 多进程时每个进程处理不同的 scaffold
+    """
+    if min_gap < 1:
+        raise ValueError("Minimum gap length must be positive")
+    names = open_fasta(fasta).references  # 建立或读取 .fai
+    if processes <= 1 or len(names) <= 1:
+        _init_scan(fasta, min_gap)
+        yield from map(_scan_scaffold, names)
+        return
+    with multiprocessing.Pool(
+        min(processes, len(names)), _init_scan, (fasta, min_gap)
+    ) as pool:
+        yield from pool.imap(_scan_scaffold, names)
+
+
+def format_agp_from_gaps(
+    scaffold: str, length: int, gaps: list, gap_type: str = "U", gap_evidence: str = "proximity_ligation"
+) -> list:
+    """
+    由 scaffold 的 N 区间生成 9 列 agp, 格式同 format_9col_agp;
+    gap 之间的区段为 W 组件, 命名为 {scaffold}_ctg{n};
+    agp 不允许以 gap 开始或结束, 首尾的 N 区间保留在首尾的 W 组件中, 坐标仍从 1 连续到 scaffold 长度
+    """
+    gaps = [(start, end) for start, end in gaps if start > 0 and end < length]
+    processed = []
+    order = 0
+    contig_index = 0
+    pos = 0
+    for gap_start, gap_end in gaps + [(length, length)]:
+        if gap_start > pos:
+            order += 1
+            contig_index += 1
+            size = gap_start - pos
+            processed.append(
+                (scaffold, pos + 1, gap_start, order, "W", f"{scaffold}_ctg{contig_index}", 1, size, "+")
+            )
+        if gap_end > gap_start:
+            order += 1
+            size = gap_end - gap_start
+            processed.append(
+                (scaffold, gap_start + 1, gap_end, order, gap_type, "GAP", 1, size, gap_evidence)
+            )
+        pos = gap_end
+    return processed
+
+
+def agp_from_fasta(args, metrics):
+    """--fasta 模式: 由 scaffold 序列中的 N 区间重建 agp"""
+    lines = 0
+    with metrics.stage("scan") as stage, open_output(args.output, "auto") as f:
+        for scaffold, length, gaps in scan_fasta_gaps(args.fasta, args.min_gap, args.processes):
+            rows = format_agp_from_gaps(scaffold, length, gaps, args.gap_type, args.gap_evidence)
+            if args.output_format == 4:
+                rows = [
+                    (scaffold, row[5], "0", i)
+                    for i, row in enumerate((row for row in rows if row[4] == "W"), 1)
+                ]
+            for info in rows:
+                f.write("\t".join(map(str, info)) + "\n")
+            lines += len(rows)
+        stage.add(lines=lines, nbytes=file_size(args.fasta))
+    print(f"AGP file derived from {args.fasta} and saved to {args.output}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Convert AGP files")
 
@@ -379,7 +470,7 @@ def main():
         "Basic parameters", "Basic convert settings"
     )
     basic_group.add_argument(
-        "-i", "--input", type=str, required=True, help="Input AGP file"
+        "-i", "--input", type=str, required=False, help="Input AGP file"
     )
     basic_group.add_argument(
         "-o", "--output", type=str, required=True, help="Output AGP file"
@@ -408,6 +499,43 @@ def main():
         help="Gap size for AGP4 to AGP9 conversion, default=100bp",
     )
 
+    fasta_group = parser.add_argument_group(
+        "From fasta parameters",
+        "derive AGP from N runs of scaffold fasta instead of -i, output can be used as -i for further changes",
+    )
+    fasta_group.add_argument(
+        "--fasta",
+        type=str,
+        required=False,
+        help="Scaffold fasta (uncompressed), .fai is built if missing",
+    )
+    fasta_group.add_argument(
+        "--min_gap",
+        type=int,
+        default=10,
+        help="Minimum length of N run treated as gap, shorter N runs stay in contig, default=10",
+    )
+    fasta_group.add_argument(
+        "--gap_type",
+        type=str,
+        default="U",
+        choices=["U", "N"],
+        help="Component type of gap lines, U: unknown size, N: known size, default=U",
+    )
+    fasta_group.add_argument(
+        "--gap_evidence",
+        type=str,
+        default="proximity_ligation",
+        help="Last column of gap lines, default=proximity_ligation",
+    )
+    fasta_group.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        default=1,
+        help="Process number, scaffolds are scanned in parallel, default=1",
+    )
+
     change_group = parser.add_argument_group(
         "Changing parameters",
         "using for change/filter chrom id, reverse whole chroms\nProcess order: select -> filter -> id2id -> reverse",
@@ -460,72 +588,87 @@ def main():
         help="Prefix of rename chromosome by size, default = 'chr'",
     )
 
+    add_metrics_arguments(parser)
     args = parser.parse_args()
-
-    parse = AGPParser(args.input)
-    contigs, agp_format, size_dict = parse.get_result()
-
-    # choose size
-    final_size_dict = {}
-    if args.size:
-        print("Process: parsing input size file as final size dict.")
-        final_size_dict = get_size_dict(args.size)
-    elif size_dict:
-        print("Process: parsing size dict from input agp.")
-        final_size_dict = size_dict
-
-    # convert format
-    if args.select:
-        print("Process: select chromosome by keywords.")
-        select_lst = parse_string(args.select)
-        contigs = select_chrom_id(contigs, select_lst)
-    if args.filter:
-        print("Process: filter out keywords.")
-        filter_lst = parse_string(args.filter)
-        contigs = filter_chrom_id(contigs, filter_lst)
-    if args.id2id:
-        print("Process: replace chromosome ID.")
-        id_relation_dict = get_id_relation_dict(args.id2id)
-        contigs = change_chrom_id(contigs, id_relation_dict)
-    if args.reverse:
-        print("Process: rever whole chromosome.")
-        reverse_list = parse_string(args.reverse)
-        contigs = revers_chrom(contigs, reverse_list)
-
-    contigs = reorder_pos(contigs)  # must reorder before insert gap
-
-    if args.output_format == 9 and args.gap_size > 0:
-        print("Process: insert gap lines.")
-        contigs = insert_gap(contigs)
-
-    # final reorder
-    contigs = reorder_pos(contigs)
-    if args.nature:
-        print("Process: reorder chromosome order.")
-        contigs = nature_order(contigs)
-
-    if args.sizeOrder:
-        if not final_size_dict:
-            print("Can't find contig size, skip reorder by size.")
-        else:
-            print("Process: rename chromosome by total size")
-            change_relation_dict = get_chrom_size_dict(
-                contigs, final_size_dict, args.prefix
-            )
-            contigs = change_chrom_id(contigs, change_relation_dict)
+    if bool(args.input) == bool(args.fasta):
+        parser.error("one of -i/--input or --fasta is required")
+    metrics = metrics_from_args(args, "convert_agp")
+
+    if args.fasta:
+        agp_from_fasta(args, metrics)
+        metrics.close()
+        return
+
+    with metrics.stage("read") as stage:
+        parse = AGPParser(args.input)
+        contigs, agp_format, size_dict = parse.get_result()
+
+        # choose size
+        final_size_dict = {}
+        if args.size:
+            print("Process: parsing input size file as final size dict.")
+            final_size_dict = get_size_dict(args.size)
+        elif size_dict:
+            print("Process: parsing size dict from input agp.")
+            final_size_dict = size_dict
+        stage.add(lines=len(contigs), nbytes=file_size(args.input))
+
+    with metrics.stage("convert"):
+        # convert format
+        if args.select:
+            print("Process: select chromosome by keywords.")
+            select_lst = parse_string(args.select)
+            contigs = select_chrom_id(contigs, select_lst)
+        if args.filter:
+            print("Process: filter out keywords.")
+            filter_lst = parse_string(args.filter)
+            contigs = filter_chrom_id(contigs, filter_lst)
+        if args.id2id:
+            print("Process: replace chromosome ID.")
+            id_relation_dict = get_id_relation_dict(args.id2id)
+            contigs = change_chrom_id(contigs, id_relation_dict)
+        if args.reverse:
+            print("Process: rever whole chromosome.")
+            reverse_list = parse_string(args.reverse)
+            contigs = revers_chrom(contigs, reverse_list)
+
+        contigs = reorder_pos(contigs)  # must reorder before insert gap
+
+        if args.output_format == 9 and args.gap_size > 0:
+            print("Process: insert gap lines.")
+            contigs = insert_gap(contigs)
+
+        # final reorder
+        contigs = reorder_pos(contigs)
+        if args.nature:
+            print("Process: reorder chromosome order.")
             contigs = nature_order(contigs)
 
+        if args.sizeOrder:
+            if not final_size_dict:
+                print("Can't find contig size, skip reorder by size.")
+            else:
+                print("Process: rename chromosome by total size")
+                change_relation_dict = get_chrom_size_dict(
+                    contigs, final_size_dict, args.prefix
+                )
+                contigs = change_chrom_id(contigs, change_relation_dict)
+                contigs = nature_order(contigs)
+
     # output
-    if args.output_format == 4:
-        processed = contigs
-    elif args.output_format == 9:
-        if not final_size_dict:
-            raise ValueError("Contig size file is required for AGP9 format")
-        processed = format_9col_agp(contigs, final_size_dict, args.gap_size)
-    with open(args.output, "w") as f:
-        for info in processed:
-            f.write("\t".join(map(str, info)) + "\n")
+    with metrics.stage("write") as stage:
+        if args.output_format == 4:
+            processed = contigs
+        elif args.output_format == 9:
+            if not final_size_dict:
+                raise ValueError("Contig size file is required for AGP9 format")
+            processed = format_9col_agp(contigs, final_size_dict, args.gap_size)
+        with open_output(args.output, "auto") as f:
+            for info in processed:
+                f.write("\t".join(map(str, info)) + "\n")
+        stage.add(lines=len(processed))
     print(f"AGP file converted and saved to {args.output}")
+    metrics.close()
 
 
 if __name__ == "__main__":
@@ -1,28 +1,55 @@
+import os
+import sys
 import argparse
-import gzip
-from typing import List
+from typing import Iterable, List, Tuple
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "standard_module"))
+from my_file_io import detect_format, iter_lines  # noqa: E402
+from my_mapreduce import ShardExecutor, read_range  # noqa: E402
+from my_metrics import add_metrics_arguments, file_size, metrics_from_args  # noqa: E402
 
-def process_depth_file(file_path: str, thresholds: List[int]) -> List[float]:
-    open_func = gzip.open if file_path.endswith(".gz") else open
 
+def count_depth(lines: Iterable[bytes], thresholds: List[int]) -> Tuple[int, List[int]]:
     total_base = 0
     thresholds_counts = [0] * len(thresholds)
 
-    with open_func(file_path, "rt") as f:
-        for line in f:
-            if line.startswith("#"):
-                continue
-            parts = line.strip().split("\t")
-            try:
-                depth = int(parts[2])
-            except ValueError:
-                continue
-
-            total_base += 1
-            for i, threshold in enumerate(thresholds):
-                if depth >= threshold:
-                    thresholds_counts[i] += 1
+    for line in lines:
+        if line.startswith(b"#"):
+            continue
+        parts = line.strip().split(b"\t")
+        try:
+            depth = int(parts[2])
+        except ValueError:
+            continue
+
+        total_base += 1
+        for i, threshold in enumerate(thresholds):
+            if depth >= threshold:
+                thresholds_counts[i] += 1
+
+    return total_base, thresholds_counts
+
+
+def _count_shard(file_path, shard, thresholds):
+    return count_depth(read_range(file_path, shard), thresholds)
+
+
+def _merge_counts(a, b):
+    return a[0] + b[0], [x + y for x, y in zip(a[1], b[1])]
+
+
+def process_depth_file(
+    file_path: str, thresholds: List[int], processes: int = 1
+) -> List[float]:
+    # 按字节读取, 无需逐行解码; plain/gzip/bgzf/bz2/xz 依据文件头自动识别
+    # 未压缩文件可按行切分为多个区间, 多进程分别计数后合并
+    if processes > 1 and detect_format(file_path) == "plain":
+        executor = ShardExecutor(processes)
+        total_base, thresholds_counts = executor.map_reduce(
+            file_path, _count_shard, _merge_counts, (0, [0] * len(thresholds)), thresholds
+        )
+    else:
+        total_base, thresholds_counts = count_depth(iter_lines(file_path), thresholds)
 
     if total_base == 0:
         return [0.0] * len(thresholds)
@@ -44,15 +71,30 @@ def main():
         default="1,2,5,10,20",
         help="Comma separated list of depth thresholds, default: 1,2,5,10,20",
     )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        default=1,
+        help="Process number, split uncompressed depth file by lines and count in parallel, default: 1",
+    )
+    add_metrics_arguments(parser)
     args = parser.parse_args()
+    metrics = metrics_from_args(args, "coverage_percentages")
 
     thresholds = list(map(int, args.thresholds.split(",")))
 
     try:
-        coverage_percentages = process_depth_file(args.depth_file, thresholds)
+        with metrics.stage("depth") as stage:
+            coverage_percentages = process_depth_file(
+                args.depth_file, thresholds, args.processes
+            )
+            stage.add(nbytes=file_size(args.depth_file))
     except Exception as e:
         print(f"Error processing depth file: {str(e)}")
         return
+    finally:
+        metrics.close()
 
     print("\t".join([f"{t}X" for t in thresholds]))
     print("\t".join([f"{p:.2f}" for p in coverage_percentages]))
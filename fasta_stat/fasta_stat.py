@@ -0,0 +1,258 @@
+##### import #####
+import os
+import re
+import sys
+import math
+import mmap
+import time
+import argparse
+from typing import List, NamedTuple, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "standard_module"))
+from my_mapreduce import Shard, ShardExecutor  # noqa: E402
+
+#### info ####
+__author__ = "wangzhsi"
+__mail__ = "wang_zsi@outlook.com"
+__date__ = "20261019"
+__version__ = "1.0"
+
+#### main ####
+# 删除换行符的同时转为大写, 整条序列一次 translate 完成
+UPPER = bytes.maketrans(b"abcdefghijklmnopqrstuvwxyz", b"ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+N_RUN = re.compile(rb"N+")
+THRESHOLDS = (0.50, 0.60, 0.70, 0.80, 0.90)
+
+
+class SequenceStatistics:
+    """单条序列的碱基组成, contig 长度及 gap 区间 (0-based, 左闭右开)"""
+
+    __slots__ = ("sequence_id", "length", "count_a", "count_t", "count_c", "count_g", "count_n",
+                 "contigs", "gaps")
+
+    def __init__(self, sequence_id: str, seq: bytes):
+        if not seq or not sequence_id:
+            raise ValueError("Sequence and sequence ID cannot be empty")
+        self.sequence_id = sequence_id
+        self.length = len(seq)
+        self.count_a = seq.count(b"A")
+        self.count_t = seq.count(b"T")
+        self.count_c = seq.count(b"C")
+        self.count_g = seq.count(b"G")
+        self.count_n = seq.count(b"N")
+        # N 区间即 gap, gap 之间的区段即 contig
+        self.gaps = [m.span() for m in N_RUN.finditer(seq)] if self.count_n else []
+        self.contigs = []
+        start = 0
+        for gap_start, gap_end in self.gaps:
+            if gap_start > start:
+                self.contigs.append(gap_start - start)
+            start = gap_end
+        if start < self.length:
+            self.contigs.append(self.length - start)
+
+    @property
+    def gc_content(self) -> float:
+        return (self.count_g + self.count_c) / self.length * 100.0
+
+    def to_line(self) -> str:
+        length = self.length
+        return "\t".join(
+            [self.sequence_id]
+            + [f"{x:,}" for x in (length, self.count_a, self.count_t, self.count_c, self.count_g,
+                                   self.count_n, self.count_g + self.count_c)]
+            + [f"{x / length * 100.0:.2f}%" for x in (self.count_a, self.count_t, self.count_c,
+                                                     self.count_g, self.count_n)]
+            + [f"{self.gc_content:.2f}%"]
+        )
+
+
+class NStatistics(NamedTuple):
+    n50: int = 0
+    n60: int = 0
+    n70: int = 0
+    n80: int = 0
+    n90: int = 0
+
+    @classmethod
+    def from_lengths(cls, lengths: List[int]) -> "NStatistics":
+        if not lengths:
+            return cls()
+        lengths = sorted(lengths, reverse=True)
+        total = sum(lengths)
+        values = []
+        for threshold in THRESHOLDS:
+            target = math.ceil(total * threshold)
+            cumulative, value = 0, 0
+            for length in lengths:
+                cumulative += length
+                if cumulative >= target:
+                    value = length
+                    break
+            values.append(value)
+        return cls(*values)
+
+
+class FastaStatistics:
+    """全部序列的统计结果, 与 fasta_stat 输出一致"""
+
+    def __init__(self, sequences: List[SequenceStatistics]):
+        self.sequences = sequences
+        self.total_length = sum(s.length for s in sequences)
+        self.total_count_a = sum(s.count_a for s in sequences)
+        self.total_count_t = sum(s.count_t for s in sequences)
+        self.total_count_c = sum(s.count_c for s in sequences)
+        self.total_count_g = sum(s.count_g for s in sequences)
+        self.total_count_n = sum(s.count_n for s in sequences)
+        self.contig_n = NStatistics.from_lengths([c for s in sequences for c in s.contigs])
+        self.scaffold_n = NStatistics.from_lengths([s.length for s in sequences])
+
+    @property
+    def total_gc_content(self) -> float:
+        if not self.total_length:
+            return 0.0
+        return (self.total_count_g + self.total_count_c) / self.total_length * 100.0
+
+    @property
+    def total_gaps(self) -> int:
+        return sum(len(s.gaps) for s in self.sequences)
+
+    def iter_gaps(self):
+        """(sequence_id, start, end, length, gap_id)"""
+        for s in self.sequences:
+            for i, (start, end) in enumerate(s.gaps, 1):
+                yield s.sequence_id, start, end, end - start, f"{s.sequence_id}-gap-{i}"
+
+    def total_line(self) -> str:
+        if not self.total_length:
+            return "Total\t0\t0\t0\t0\t0\t0\t0.00%\t0.00%\t0.00%\t0.00%\t0.00%\t0.00%"
+        inv = 1.0 / self.total_length
+        counts = (self.total_count_a, self.total_count_t, self.total_count_c,
+                  self.total_count_g, self.total_count_n)
+        return "\t".join(
+            ["Total"]
+            + [f"{x:,}" for x in (self.total_length,) + counts + (self.total_count_g + self.total_count_c,)]
+            + [f"{x * inv * 100.0:.2f}%" for x in counts]
+            + [f"{self.total_gc_content:.2f}%"]
+        )
+
+
+###### read ######
+def _iter_records(mm, start: int, end: int):
+    """区间 [start, end) 内的 (header, 序列起点, 序列终点), 区间起点为 '>' 行首"""
+    if mm[start:start + 1] != b">":
+        pos = mm.find(b"\n>", start, end)
+        if pos == -1:
+            return
+        start = pos + 1
+    pos = start
+    while pos < end:
+        line_end = mm.find(b"\n", pos, end)
+        if line_end == -1:
+            line_end = end
+        header = mm[pos + 1:line_end].decode()
+        next_header = mm.find(b"\n>", line_end, end)
+        seq_end = end if next_header == -1 else next_header + 1
+        yield header, line_end + 1, seq_end
+        pos = seq_end
+
+
+def stat_range(path: str, shard: Shard, chr_prefix: Optional[str] = None) -> List[SequenceStatistics]:
+    """统计文件中一个区间内的所有序列; 整条序列一次性去换行/转大写, 计数及 N 区间查找均在 C 层完成"""
+    stats = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for header, start, end in _iter_records(mm, shard.start, shard.end):
+            fields = header.split()
+            sequence_id = fields[0] if fields else ""
+            if chr_prefix and not sequence_id.startswith(chr_prefix):
+                continue
+            seq = mm[start:end].translate(UPPER, b"\r\n")
+            stats.append(SequenceStatistics(sequence_id, seq))
+    return stats
+
+
+def stat_fasta(path: str, chr_prefix: Optional[str] = None, processes: int = 1) -> FastaStatistics:
+    """
+    统计 fasta (未压缩), processes > 1 时按序列边界切分文件, 多进程分别统计后按原顺序合并
+    """
+    if os.path.getsize(path) == 0:
+        return FastaStatistics([])
+    if processes > 1:
+        executor = ShardExecutor(processes, boundary=lambda line: line.startswith(b">"))
+        sequences = [s for stats in executor.map(path, stat_range, chr_prefix) for s in stats]
+    else:
+        sequences = stat_range(path, Shard(0, 0, os.path.getsize(path)), chr_prefix)
+    return FastaStatistics(sequences)
+
+
+###### write ######
+def write_base_statistics(path: str, stats: FastaStatistics):
+    with open(path, "w") as f:
+        f.write("ID\tLength\tA\tT\tC\tG\tN\tG+C\tA%\tT%\tC%\tG%\tN%\tGC%\n")
+        for s in stats.sequences:
+            f.write(s.to_line() + "\n")
+        f.write(stats.total_line() + "\n")
+
+
+def write_n50_statistics(path: str, stats: FastaStatistics):
+    with open(path, "w") as f:
+        f.write("Type\tN50\tN60\tN70\tN80\tN90\n")
+        for name, n in (("Contig", stats.contig_n), ("Scaffold", stats.scaffold_n)):
+            f.write(name + "\t" + "\t".join(f"{x:,}" for x in n) + "\n")
+
+
+def write_gap_statistics(path: str, stats: FastaStatistics):
+    with open(path, "w") as f:
+        f.write("SequenceID\tStart\tEnd\tLength\tGapID\n")
+        for gap in stats.iter_gaps():
+            f.write("\t".join(map(str, gap)) + "\n")
+
+
+def write_basic_statistics(path: str, stats: FastaStatistics):
+    sequences = stats.sequences
+    longest = max((s.length for s in sequences), default=0)
+    non_n = sum(1 for s in sequences if s.count_n == 0)
+    with open(path, "w") as f:
+        f.write(f"Total Sequences Number:\t{len(sequences):,}\n")
+        f.write(f"Total Length (bp):\t{stats.total_length:,}\n")
+        f.write(f"Longest Sequence Length (bp):\t{longest:,}\n")
+        f.write(f"GC Content(%):\t{stats.total_gc_content:.2f}%\n")
+        f.write(f"Non-N Sequences Number:\t{non_n:,}\n")
+        f.write(f"Total Gaps Number:\t{stats.total_gaps:,}\n")
+        f.write(f"Contig N50 (bp):\t{stats.contig_n.n50:,}\n")
+        f.write(f"Scaffold N50 (bp):\t{stats.scaffold_n.n50:,}\n")
+
+
+def write_statistics(stats: FastaStatistics, outdir: str = "./", prefix: str = "statistics"):
+    """写出 {prefix}_BASE/N50/GAP/Basic.txt"""
+    write_base_statistics(os.path.join(outdir, f"{prefix}_BASE.txt"), stats)
+    write_n50_statistics(os.path.join(outdir, f"{prefix}_N50.txt"), stats)
+    write_gap_statistics(os.path.join(outdir, f"{prefix}_GAP.txt"), stats)
+    write_basic_statistics(os.path.join(outdir, f"{prefix}_Basic.txt"), stats)
+
+
+def main():
+    function = "this program is used to get base/N50/gap statistics of genome, same output as fasta_stat"
+    parser = argparse.ArgumentParser(
+        description=function,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"author:\t{__author__}\nmail:\t{__mail__}\ndate:\t{__date__}\nversion:\t{__version__}\nfunction:\t{function}",
+    )
+    parser.add_argument("-f", "--fasta", required=True, help="Input fasta file")
+    parser.add_argument("-o", "--outdir", default="./", help="Output directory, default: current directory")
+    parser.add_argument("--chr_prefix", help="Prefix of chromosome sequence to include (e.g., chr)")
+    parser.add_argument("--prefix", default="statistics", help="Prefix of output files, default: statistics")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="Process number, split fasta by sequences and count in parallel, default: 1")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    print(f"Program started at: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    stats = stat_fasta(args.fasta, args.chr_prefix, args.processes)
+    write_statistics(stats, args.outdir, args.prefix)
+    print(f"Program completed at: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Total execution time: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
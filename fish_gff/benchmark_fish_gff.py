@@ -0,0 +1,242 @@
+##### import #####
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import subprocess
+#### info ####
+__author__ = 'wangzhsi'
+__mail__ = 'wang_zsi@outlook.com'
+__date__ = '20261019'
+__version__ = '1.0'
+#### main ####
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FISH_GFF = os.path.join(SCRIPT_DIR, 'fish_del_gff.py')
+GOLDEN = os.path.join(SCRIPT_DIR, 'benchmark_golden.json')
+# golden 数据集参数固定, 修改后需使用 --update_golden 重新生成
+GOLDEN_CONFIG = {'genes': 300, 'isoforms': 3, 'exons': 3, 'seed': 20240104}
+
+sys.path.insert(0, SCRIPT_DIR)
+import fish_del_gff  # noqa: E402
+
+
+def makeGff(outdir, genes, isoforms, exons, seed) -> dict:
+    """
+    生成模拟 gff3 及目标列表:
+    每个基因 1~isoforms 个转录本, 每个转录本 exons 个 exon 与 CDS;
+    mRNA 列表中一部分基因只含部分转录本 (触发可变剪切拆分), 一部分含全部转录本;
+    保留列表中的转录本一部分与目标列表重叠
+    """
+    rand = random.Random(seed)
+    files = {name: os.path.join(outdir, name) for name in
+             ['in.gff', 'gene.lst', 'mrna.lst', 'keep.lst']}
+    geneList, mrnaList, keepList = [], [], []
+    lines = 0
+    with open(files['in.gff'], 'w') as f:
+        f.write('##gff-version 3\n')
+        for g in range(genes):
+            seqid = f'chr{g % 10 + 1}'
+            start = g // 10 * 10000 + 1
+            end = start + 200 * exons + 100
+            gene = f'gene{g:07d}'
+            f.write(f'{seqid}\tbench\tgene\t{start}\t{end}\t.\t+\t.\tID={gene};Name=G{g};gene_biotype=protein_coding\n')
+            lines += 1
+            mrnas = [f'{gene}.t{i}' for i in range(rand.randint(1, isoforms))]
+            for mrna in mrnas:
+                f.write(f'{seqid}\tbench\tmRNA\t{start}\t{end}\t.\t+\t.\tID={mrna};Parent={gene}\n')
+                lines += 1
+                for e in range(exons):
+                    s = start + e * 200
+                    f.write(f'{seqid}\tbench\texon\t{s}\t{s + 99}\t.\t+\t.\tID={mrna}.exon{e};Parent={mrna}\n')
+                    f.write(f'{seqid}\tbench\tCDS\t{s}\t{s + 99}\t.\t+\t0\tID={mrna}.cds{e};Parent={mrna}\n')
+                    lines += 2
+            draw = rand.random()
+            if draw < 0.2:
+                geneList.append(gene)
+                mrnaList.append(mrnas[0])
+            elif draw < 0.3:
+                geneList.append(gene)
+                mrnaList.extend(mrnas)
+            if rand.random() < 0.05:
+                keepList.append(mrnas[-1])
+    for name, ids in [('gene.lst', geneList), ('mrna.lst', mrnaList), ('keep.lst', keepList)]:
+        with open(files[name], 'w') as f:
+            f.write(''.join(i + '\n' for i in ids))
+    files['lines'] = lines
+    return files
+
+
+def getScenarios(keep=True) -> list:
+    scenarios = []
+    for targettype in ['gene', 'mrna']:
+        for functype in ['fish', 'del']:
+            scenarios.append((targettype, functype, False))
+            if keep:
+                scenarios.append((targettype, functype, True))
+    return scenarios
+
+
+def _scenarioName(targettype, functype, keep):
+    return f"{targettype}_{functype}{'_keep' if keep else ''}"
+
+
+def runScenario(files, outgff, targettype, functype, keep, extra=()) -> dict:
+    """以子进程运行 fish_del_gff.py, 记录耗时及峰值内存"""
+    cmd = [sys.executable, FISH_GFF, '-ig', files['in.gff'], '-og', outgff,
+           '-l', files[f'{targettype}.lst'], '-t', targettype, '-f', functype]
+    if keep:
+        cmd += ['-k', files['keep.lst']]
+    cmd += list(extra)
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd)
+    _, status, usage = os.wait4(proc.pid, 0)
+    seconds = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f"command failed: {' '.join(cmd)}")
+    # ru_maxrss 在 linux 下单位为 KB, macOS 下为 byte
+    peak = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return {
+        'seconds': round(seconds, 4),
+        'lines_per_second': round(files['lines'] / seconds, 1),
+        'peak_rss_mb': round(peak / 1024 / 1024, 2),
+    }
+
+
+def benchFunctions(files, targettype='mrna', functype='fish') -> dict:
+    """进程内分别计时 Gff.parse, GffNode.parserSummary/parserNode 及 checkmRNA"""
+    gff = fish_del_gff.Gff(files['in.gff'], os.devnull, files[f'{targettype}.lst'],
+                           targettype, functype, files['keep.lst'])
+    with open(files['in.gff']) as f:
+        start = time.perf_counter()
+        nodes = [list(node) for node in gff.parse(f) if node]
+        parse = time.perf_counter() - start
+
+    gffnode = fish_del_gff.GffNode()
+    start = time.perf_counter()
+    for node in nodes:
+        gffnode.setNode(node)
+        gffnode.parserSummary(node)
+    summary = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for node in nodes:
+        gffnode.setNode(node)
+        gffnode.parserNode(node)
+    parserNode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for node in nodes:
+        gffnode.setNode(node)
+        fish_del_gff.checkmRNA(node, gffnode.get(node), gffnode.getInfo, gff.mrnaTarget, functype)
+    check = time.perf_counter() - start
+
+    return {
+        'nodes': len(nodes),
+        'parse_seconds': round(parse, 4),
+        'parserSummary_seconds': round(summary, 4),
+        'parserNode_seconds': round(parserNode, 4),
+        'checkmRNA_seconds': round(check, 4),
+    }
+
+
+def md5sum(path) -> str:
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def goldenHashes(workdir, extra=()) -> dict:
+    files = makeGff(workdir, **GOLDEN_CONFIG)
+    hashes = {}
+    for targettype, functype, keep in getScenarios():
+        name = _scenarioName(targettype, functype, keep)
+        outgff = os.path.join(workdir, name + '.gff')
+        runScenario(files, outgff, targettype, functype, keep, extra)
+        hashes[name] = md5sum(outgff)
+    return hashes
+
+
+def checkGolden(workdir, extra=()) -> bool:
+    """对比 golden 数据集输出的 md5, 保证 -k 保留列表及可变剪切拆分的语义不变"""
+    with open(GOLDEN) as f:
+        expected = json.load(f)['md5']
+    hashes = goldenHashes(workdir, extra)
+    ok = True
+    for name, md5 in expected.items():
+        if hashes.get(name) != md5:
+            print(f'golden mismatch: {name}')
+            ok = False
+    return ok
+
+
+def main():
+    function = 'this program is used to benchmark fish_del_gff.py with synthetic gff3'
+    author, mail, date, version = __author__, __mail__, __date__, __version__
+
+    parser = argparse.ArgumentParser(
+        description=function,
+        epilog=f'author: {author}\nmail: {mail}\ndate: {date}\nversion: {version}\nfunction: {function}',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('-g', help='gene number of synthetic gff, default = 20000',
+                        type=int, default=20000, required=False)
+    parser.add_argument('-i', help='max isoforms per gene, default = 3',
+                        type=int, default=3, required=False)
+    parser.add_argument('-e', help='exons per isoform, default = 5',
+                        type=int, default=5, required=False)
+    parser.add_argument('-s', help='random seed, default = 1',
+                        type=int, default=1, required=False)
+    parser.add_argument('-o', help='output json file, default = fish_gff_benchmark.json',
+                        type=str, default='fish_gff_benchmark.json', required=False)
+    parser.add_argument('-x', help='extra arguments passed to fish_del_gff.py, e.g. "-p 4"',
+                        type=str, default='', required=False)
+    parser.add_argument('--check', help='only compare outputs of golden dataset and exit',
+                        action='store_true', default=False)
+    parser.add_argument('--update_golden', help='regenerate golden md5 file and exit',
+                        action='store_true', default=False)
+    args = parser.parse_args()
+    extra = args.x.split()
+
+    with tempfile.TemporaryDirectory(prefix='fish_gff_bench.') as workdir:
+        if args.update_golden:
+            with open(GOLDEN, 'w') as f:
+                json.dump({'config': GOLDEN_CONFIG, 'md5': goldenHashes(workdir)}, f, indent=2)
+                f.write('\n')
+            print(f'golden saved to {GOLDEN}')
+            return
+
+        golden = checkGolden(workdir, extra)
+        print(f"golden check: {'pass' if golden else 'FAILED'}")
+        if args.check:
+            sys.exit(0 if golden else 1)
+
+        files = makeGff(workdir, args.g, args.i, args.e, args.s)
+        result = {
+            'config': {'genes': args.g, 'isoforms': args.i, 'exons': args.e, 'seed': args.s,
+                       'lines': files['lines'], 'extra': args.x},
+            'golden': golden,
+            'scenarios': {},
+        }
+        for targettype, functype, keep in getScenarios():
+            name = _scenarioName(targettype, functype, keep)
+            outgff = os.path.join(workdir, name + '.gff')
+            result['scenarios'][name] = runScenario(files, outgff, targettype, functype, keep, extra)
+            print(name, result['scenarios'][name])
+        result['functions'] = benchFunctions(files)
+
+    with open(args.o, 'w') as f:
+        json.dump(result, f, indent=2)
+        f.write('\n')
+    print(f'benchmark saved to {args.o}')
+
+
+if __name__ == '__main__':
+    main()
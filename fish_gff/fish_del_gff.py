@@ -1,6 +1,17 @@
 ##### import #####
+import io
+import bisect
+import os
 import re
+import sys
+import shutil
 import argparse
+import tempfile
+from urllib.parse import unquote
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'standard_module'))
+from my_file_io import detect_format, decode_line, open_input, open_output  # noqa: E402
+from my_metrics import add_metrics_arguments, file_size, metrics_from_args  # noqa: E402
+from my_mapreduce import ShardExecutor, read_range  # noqa: E402
 #### info ####
 __author__ = 'wangzhsi'
 __mail__ = 'wang_zsi@outlook.com'
@@ -18,8 +29,13 @@ class Type:
     region = 'region'
     pseudogene = 'pseudogene'
     transcript = 'transcript'
-    idPattern = 'ID=([^;]+);'
-    parentPattern = 'Parent=([^;]+)'
+    # 属性需位于第 9 列开头或紧跟 ';', ID 为最后一个属性时同样可以匹配
+    idPattern = r'(?:^|;)\s*ID=([^;\r\n]+)'
+    parentPattern = r'(?:^|;)\s*Parent=([^;\r\n]+)'
+
+
+idRegex = re.compile(Type.idPattern)
+parentRegex = re.compile(Type.parentPattern)
 
 
 def safeLower(s):
@@ -28,7 +44,7 @@ def safeLower(s):
     return s
 
 
-def getIdList(infile) -> list:
+def getIdList(infile) -> frozenset:
     if not infile:
         return None
     ids = set()
@@ -38,45 +54,244 @@ def getIdList(infile) -> list:
                 continue
             id_ = line.strip().split('\t', 1)[0]  # 使用了分割时指定的列数，避免了不必要的数组创建
             ids.add(id_)  # 直接添加到集合中，可以避免后续的set转换
-    return list(ids)  # 由于函数的返回类型为列表，因此最后需要转换为列表后返回
+    return frozenset(ids)  # 返回不可变集合, 逐节点判断时为 O(1) 查找
+
+
+def _extract_id(splited_gff8):
+    match = idRegex.search(splited_gff8)
+    return match.group(1) if match else None
+
+
+def _extract_span(tab_separated_values):
+    return tab_separated_values[0], int(tab_separated_values[3]), int(tab_separated_values[4])
 
 
 def _extract_parent(id, node_type, splited_gff8):
     if node_type == Type.gene:
         return id
     else:
-        return re.findall(Type.parentPattern, splited_gff8)
+        return parentRegex.findall(splited_gff8) or [None]
+
+
+WRITE_BUFFER = 1 << 20  # 输出缓冲 1M
+BATCH_WRITE_BUFFER = 1 << 16  # 批量模式同时打开多个输出, 每个缓冲 64k
+CHUNK_PER_THREAD = 4  # 并行时每个进程分到的区间数, 便于负载均衡
+INDEX_SUFFIX = '.fgi'
+INDEX_VERSION = '3'
+
+
+def getIndexPath(ingff):
+    return ingff + INDEX_SUFFIX
+
+
+def buildIndex(ingff, index=None) -> str:
+    """
+    扫描 gff, 记录每个 gene 节点的字节偏移与长度, 以及 mRNA -> gene 对应关系;
+    索引文件每行: gene_id\toffset\tlength\tmrna1,mrna2\tseqid\tstart\tend
+    首行记录 gff 的大小和修改时间, 用于判断索引是否过期
+    """
+    index = index or getIndexPath(ingff)
+    stat = os.stat(ingff)
+    idPattern = re.compile(Type.idPattern.encode())  # 与 idRegex 一致的 bytes 版本
+    blocks = []  # [gene, offset, length, mrnas, span]
+    offset = 0
+    with open(ingff, 'rb') as f:
+        for line in f:
+            if b'#' not in line:
+                if b'\t' + Type.gene.encode() + b'\t' in line:
+                    if blocks:
+                        blocks[-1][2] = offset - blocks[-1][1]
+                    cols = line.split(b'\t', 8)
+                    gene = idPattern.findall(cols[8]) if len(cols) > 8 else None
+                    span = (cols[0], cols[3], cols[4]) if len(cols) > 8 else (b'', b'0', b'0')
+                    blocks.append([gene[0] if gene else None, offset, 0, [], span])
+                elif blocks:
+                    cols = line.split(b'\t', 8)
+                    if len(cols) > 8 and cols[2].lower() == Type.mrna.encode():
+                        mrna = idPattern.findall(cols[8])
+                        if mrna:
+                            blocks[-1][3].append(mrna[0])
+            offset += len(line)
+    if blocks:
+        blocks[-1][2] = offset - blocks[-1][1]
+
+    with open(index, 'wb') as out:
+        out.write('#fish_gff_index\t{0}\t{1}\t{2}\n'.format(
+            INDEX_VERSION, stat.st_size, stat.st_mtime_ns).encode())
+        for gene, start, length, mrnas, span in blocks:
+            if gene is None:  # 无 ID 的 gene 无法被检索, 不记录
+                continue
+            out.write(b'%s\t%d\t%d\t%s\t%s\n' % (gene, start, length, b','.join(mrnas), b'\t'.join(span)))
+    return index
+
+
+def loadIndex(ingff, index=None):
+    """
+    读取索引, 索引不存在或 gff 已改变时返回 None
+    return: ({gene: [(offset, length, seqid, start, end), ...]}, {mrna: gene})
+    """
+    index = index or getIndexPath(ingff)
+    if not os.path.exists(index):
+        return None
+    stat = os.stat(ingff)
+    genes, mrnas = {}, {}
+    with open(index, 'r') as f:
+        header = f.readline().rstrip('\n').split('\t')
+        if header != ['#fish_gff_index', INDEX_VERSION, str(stat.st_size), str(stat.st_mtime_ns)]:
+            return None
+        for line in f:
+            gene, start, length, mrna, seqid, spanStart, spanEnd = line.rstrip('\n').split('\t')
+            genes.setdefault(gene, []).append((int(start), int(length), seqid, int(spanStart), int(spanEnd)))
+            for i in mrna.split(','):
+                if i:
+                    mrnas[i] = gene
+    return genes, mrnas
+
+
+def getIndex(ingff):
+    """读取索引, 必要时自动(重新)建立"""
+    result = loadIndex(ingff)
+    if result is None:
+        buildIndex(ingff)
+        result = loadIndex(ingff)
+    return result
+
+
+class RegionIndex:
+    """
+    BED 区间索引: 每条序列的区间排序合并后保存起止位置, 查询时二分查找
+    """
+
+    def __init__(self, bedfile):
+        regions = {}
+        with open(bedfile, 'r') as f:
+            for line in f:
+                if not line.strip() or line.startswith(('#', 'track', 'browser')):
+                    continue
+                lines = line.rstrip('\n').split('\t')
+                # bed 为 0-based 半开区间, 转为 gff 的 1-based 闭区间
+                regions.setdefault(lines[0], []).append((int(lines[1]) + 1, int(lines[2])))
+        self.starts = {}
+        self.ends = {}
+        for seqid, intervals in regions.items():
+            intervals.sort()
+            merged = []
+            for start, end in intervals:
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self.starts[seqid] = [i[0] for i in merged]
+            self.ends[seqid] = [i[1] for i in merged]
+
+    def overlap(self, seqid, start, end) -> bool:
+        ends = self.ends.get(seqid)
+        if not ends:
+            return False
+        i = bisect.bisect_left(ends, start)  # 第一个终点不小于 start 的区间
+        return i < len(ends) and self.starts[seqid][i] <= end
+
+
+def _parseAttr(splited_gff8) -> dict:
+    """解析第 9 列属性, 值按 gff3 规范做 url 解码"""
+    attrs = {}
+    for kv in splited_gff8.strip().split(';'):
+        if '=' in kv:
+            key, value = kv.split('=', 1)
+            attrs[key.strip()] = unquote(value)
+    return attrs
+
+
+class AttrFilter:
+    """
+    单个属性条件, 可调用, 参数为属性字典:
+    key=value: 值相等; key@file: 值在文件(单列)中; key~regex: 值匹配正则
+    多值属性 (逗号分隔) 任一值满足 = / @ 即可;
+    使用类而非闭包, 以便 -p 多进程 (spawn/forkserver) 时随 Gff 对象 pickle 到子进程
+    """
+
+    def __init__(self, expr):
+        match = re.match(r'^([^=@~]+)([=@~])(.*)$', expr)
+        if not match:
+            raise ValueError(f"Invalid attribute filter: {expr}")
+        self.key, self.op, value = match.groups()
+        self.pattern = re.compile(value) if self.op == '~' else None
+        self.values = None
+        if self.op != '~':
+            self.values = getIdList(value) if self.op == '@' else frozenset([value])
+
+    def __call__(self, attrs) -> bool:
+        if self.key not in attrs:
+            return False
+        attr = attrs[self.key]
+        if self.pattern is not None:
+            return self.pattern.search(attr) is not None
+        return attr in self.values or any(i in self.values for i in attr.split(','))
+
+
+class AttrFilters:
+    """多个属性条件需同时满足, 参数为第 9 列字符串"""
+
+    def __init__(self, exprs):
+        self.checks = [AttrFilter(expr) for expr in exprs]
+
+    def __call__(self, splited_gff8) -> bool:
+        if splited_gff8 is None:
+            return False
+        attrs = _parseAttr(splited_gff8)
+        return all(c(attrs) for c in self.checks)
+
+
+def compileAttrFilter(expr):
+    """编译单个属性条件, 返回判断函数 (AttrFilter)"""
+    return AttrFilter(expr)
+
+
+def compileAttrFilters(exprs):
+    """多个属性条件需同时满足"""
+    return AttrFilters(exprs)
 
 
 class GffNode:
 
-    def setNode(self, node: str):
+    def setNode(self, node: list):
         self.node = node
-        self._info = []
-        self._summary = {'gene': '', 'mrna': []}
+        self._info = None
+        self._summary = None
         return node
 
+    def parserSummary(self, node):
+        """只解析 gene/mRNA 行的属性, 获取基因及转录本 id, 用于判断整个节点的去留"""
+        summary = {'gene': '', 'mrna': [], 'span': None, 'mrnaSpan': [], 'attr': None, 'mrnaAttr': []}
+        for line in node:
+            tab_separated_values = line.split('\t', 8)
+            if len(tab_separated_values) < 9:
+                continue
+            node_type = tab_separated_values[2].lower()
+            if node_type == Type.gene:
+                summary['gene'] = _extract_id(tab_separated_values[8])
+                summary['span'] = _extract_span(tab_separated_values)
+                summary['attr'] = tab_separated_values[8]
+            elif node_type == Type.mrna:
+                summary['mrna'].append(_extract_id(tab_separated_values[8]))
+                summary['mrnaSpan'].append(_extract_span(tab_separated_values))
+                summary['mrnaAttr'].append(tab_separated_values[8])
+        self._summary = summary
+
     def parserNode(self, node):
-        """解析节点字符串并提取相关信息"""
-        node_lines = node.split('\n')
-        for line in node_lines:
+        """解析节点(行列表)中每一行, 仅在需要拆分可变剪切时调用"""
+        self._info = []
+        for line in node:
             stripped_line = line.strip()
             if not stripped_line:
                 continue
+            line = line[:-1] if line.endswith('\n') else line
             tab_separated_values = line.split('\t')
-            id = re.findall(Type.idPattern, tab_separated_values[8])[0]
+            id = _extract_id(tab_separated_values[8])
             node_type = safeLower(tab_separated_values[2])
 
             parent = _extract_parent(id, node_type, tab_separated_values[8])
 
-            if node_type == Type.gene:
-                self._summary['gene'] = id
-                # parent = list(parent)        类型为gene时, 传入的id为字符串格式, 不是列表格式
-            elif node_type == Type.mrna:
-                self._summary['mrna'].append(id)
-            else:
-                node_type == 'level3'  # level3节点的处理
-
             self._info.append({
                 'parent': parent,
                 'type': node_type,
@@ -85,53 +300,291 @@ class GffNode:
             })
 
     def get(self, node):
-        if not self._info:
-            self.parserNode(node)
-        summary = self._summary
-        info = self._info
-        return summary, info
+        if self._summary is None:
+            self.parserSummary(node)
+        return self._summary
+
+    def getInfo(self):
+        if self._info is None:
+            self.parserNode(self.node)
+        return self._info
 
 
 class Gff:
 
-    def __init__(self, ingff, outgff, targetlist, targettype, functype, keeplist='') -> None:
-        self.ingff = open(ingff, 'r')
-        self.outgff = open(outgff, 'w')
+    def __init__(self, ingff, outgff, targetlist, targettype, functype, keeplist='', index=False,
+                 threads=1, regionfile=None, attrfilters=None, bgzf=False) -> None:
+        self.ingffPath = ingff
+        self.outgffPath = outgff
+        self.compress = 'bgzf' if bgzf else None
+        # 压缩输入无法按字节偏移读取, 不使用索引及分块并行, 多线程用于 bgzf 解压
+        self.compressed = detect_format(ingff) != 'plain'
+        # 索引只用于 fish 模式, del 模式需要遍历全部节点; 仅有属性条件时也需要遍历
+        self.useIndex = index and functype == 'fish' and bool(targetlist or regionfile) and not self.compressed
+        self.threads = threads
         self.targetlist = getIdList(targetlist)
         self.functype = functype
         self.targettype = targettype
         self.keeplist = getIdList(keeplist)
+        # 区间模式: 与 bed 区间重叠的基因/转录本作为目标
+        self.regions = RegionIndex(regionfile) if regionfile else None
+        # 属性模式: 属性满足全部条件的基因/转录本作为目标, 条件只编译一次
+        self.attrFilter = compileAttrFilters(attrfilters) if attrfilters else None
+        self.selector = bool(self.regions or self.attrFilter)
+        # mRNA 模式的目标集合与保留列表只在启动时合并一次
+        if self.keeplist and targettype == 'mrna' and self.targetlist is not None:
+            self.mrnaTarget = mergeTarget(self.targetlist, self.keeplist, functype)
+        else:
+            self.mrnaTarget = self.targetlist
         self.gffnode = GffNode()
         pass
 
-    def parse(self):    # 依据第三列gene将gff文件分割处理
-        node = ''
-        for line in self.ingff:
+    def parse(self, lines):    # 依据第三列gene将gff文件分割处理, 每个节点为行列表
+        node = []
+        geneTag = '\t{0}\t'.format(Type.gene)
+        for line in lines:
             if not line or '#' in line:
                 continue
-            if '\t{0}\t'.format(Type.gene) in line and node:
+            if geneTag in line and node:
                 yield self.gffnode.setNode(node)
-                node = ''
-            node = node + line
+                node = []
+            node.append(line)
         yield self.gffnode.setNode(node)
 
-    def search(self):
-        result = ''
-        for node in self.parse():
+    def parseIndex(self):   # 依据索引直接读取目标 gene 节点, 按原文件顺序输出
+        genes, mrnas = getIndex(self.ingffPath)
+        wanted = set()
+        if self.regions:
+            # 转录本位于基因区间内, 先按基因区间粗筛, 在 filter 中精确判断
+            wanted.update(gene for gene, blocks in genes.items()
+                          if any(self.regions.overlap(*b[2:]) for b in blocks))
+        elif self.targettype == 'gene':
+            wanted.update(self.targetlist)
+        else:
+            wanted.update(mrnas[i] for i in self.targetlist if i in mrnas)
+        if self.keeplist:
+            wanted.update(mrnas[i] for i in self.keeplist if i in mrnas)
+        blocks = sorted(set(b[:2] for gene in wanted for b in genes.get(gene, ())))
+        with open(self.ingffPath, 'rb') as f:
+            for start, length in blocks:
+                f.seek(start)
+                lines = map(decode_line, io.BytesIO(f.read(length)))
+                node = [line for line in lines if '#' not in line]
+                yield self.gffnode.setNode(node)
+
+    def filter(self, nodes):    # 逐个节点判断, 产出需要保留的行列表
+        for node in nodes:
             if not node:
                 continue
-            summary, info = self.gffnode.get(node)
+            summary = self.gffnode.get(node)
             if self.targettype == 'gene':
-                if checkGene(summary, self.targetlist, self.functype, self.keeplist):
-                    result = result + node
+                target = self.selectTarget(summary) if self.selector else self.targetlist
+                if checkGene(summary, target, self.functype, self.keeplist):
+                    yield node
             if self.targettype == 'mrna':
-                result = result + \
-                    checkmRNA(node, summary, info, self.targetlist,
-                              self.functype, self.keeplist)
-        self.outgff.write(result)
+                if self.selector:
+                    mrnas = set(summary['mrna'])
+                    yield selectmRNA(node, mrnas, self.selectTarget(summary),
+                                     self.gffnode.getInfo, self.functype)
+                else:
+                    yield checkmRNA(node, summary, self.gffnode.getInfo, self.mrnaTarget, self.functype)
+
+    def selectTarget(self, summary):
+        """
+        区间/属性模式下节点的目标 id, 需同时满足 -r, -a 及 -l (若提供) 的条件
+        gene: 基因满足条件时返回 {gene}, 否则为空
+        mrna: 满足条件的转录本, 并按 mergeTarget 的规则合并保留列表
+        """
+        if self.targettype == 'gene':
+            candidates = [(summary['gene'], summary['span'], summary['attr'])]
+        else:
+            candidates = zip(summary['mrna'], summary['mrnaSpan'], summary['mrnaAttr'])
+        common = set()
+        for id_, span, attr in candidates:
+            if self.targetlist is not None and id_ not in self.targetlist:
+                continue
+            if self.regions and not (span and self.regions.overlap(*span)):
+                continue
+            if self.attrFilter and not self.attrFilter(attr):
+                continue
+            common.add(id_)
+        if self.targettype == 'gene':
+            return frozenset(common)
+        if self.keeplist:
+            if self.functype == 'fish':
+                common.update(m for m in summary['mrna'] if m in self.keeplist)
+            else:
+                common = set(m for m in common if m not in self.keeplist)
+        return common
+
+    def search(self):   # 保留的节点立即写出, 内存占用取决于最大的基因
+        if self.threads > 1 and not self.useIndex and not self.compressed:
+            self.searchParallel()
+            return
+        with open_output(self.outgffPath, self.compress, threads=self.threads, buffer_size=WRITE_BUFFER) as out:
+            if self.useIndex:
+                nodes = self.parseIndex()
+                for lines in self.filter(nodes):
+                    out.writelines(lines)
+            else:
+                with open_input(self.ingffPath, threads=self.threads) as ingff:
+                    for lines in self.filter(self.parse(ingff)):
+                        out.writelines(lines)
+
+    def searchParallel(self):
+        """
+        按 gene 节点边界将输入切分为多个字节区间, 由多个进程分别筛选写入临时文件,
+        最后按原顺序合并
+        """
+        executor = ShardExecutor(self.threads, self.threads * CHUNK_PER_THREAD, boundary=_isGeneLine,
+                                 initializer=_initWorker, initargs=(self,))
+        outdir = os.path.dirname(os.path.abspath(self.outgffPath))
+        tmpdir = tempfile.mkdtemp(prefix=os.path.basename(self.outgffPath) + '.', suffix='.parts', dir=outdir)
+        try:
+            with open_output(self.outgffPath, self.compress, text=False, buffer_size=WRITE_BUFFER) as out:
+                for part in executor.map(self.ingffPath, _searchChunk, tmpdir):
+                    with open(part, 'rb') as f:
+                        shutil.copyfileobj(f, out, WRITE_BUFFER)
+                    os.remove(part)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+_geneTag = '\t{0}\t'.format(Type.gene).encode()
+
+
+def _isGeneLine(line: bytes) -> bool:
+    """并行切分时, 每个区间 (除第一个外) 均从 gene 行开始"""
+    return b'#' not in line and _geneTag in line
+
+
+class GffBatch(Gff):
+    """
+    批量模式: 多个目标列表各自输出, 只遍历一次 gff;
+    通过 id -> 任务 的倒排表找出命中每个节点的任务
+    """
+
+    def __init__(self, ingff, batchfile, targettype, functype, keeplist='', threads=1, bgzf=False) -> None:
+        self.ingffPath = ingff
+        self.threads = threads
+        self.compress = 'bgzf' if bgzf else None
+        self.jobs = getBatchJobs(batchfile, targettype, functype)
+        self.keeplist = getIdList(keeplist)
+        self.geneMap = {}   # gene id -> [job index]
+        self.mrnaMap = {}   # mrna id -> [job index]
+        self.delGeneJobs = []   # 未命中也需要输出的任务
+        self.delmRNAJobs = []
+        self.geneJobs = []
+        for i, job in enumerate(self.jobs):
+            target = getIdList(job['list'])
+            if job['targettype'] == 'gene':
+                idMap = self.geneMap
+                self.geneJobs.append(i)
+                if job['functype'] == 'del':
+                    self.delGeneJobs.append(i)
+            else:
+                idMap = self.mrnaMap
+                if self.keeplist:
+                    target = mergeTarget(target, self.keeplist, job['functype'])
+                if job['functype'] == 'del':
+                    self.delmRNAJobs.append(i)
+            for id_ in target:
+                idMap.setdefault(id_, []).append(i)
+        self.gffnode = GffNode()
 
+    def route(self, node):
+        """产出 (任务序号, 需要输出的行列表)"""
+        summary = self.gffnode.get(node)
+        geneHits = set(self.geneMap.get(summary['gene'], ()))
+        # 与 checkGene 一致: 有保留列表时, 命中保留转录本的基因在所有 gene 任务中均保留
+        if self.keeplist:
+            if any(x in self.keeplist for x in summary['mrna']):
+                geneHits = self.geneJobs
+            for i in geneHits:
+                yield i, node
+        else:
+            for i in geneHits:
+                if self.jobs[i]['functype'] == 'fish':
+                    yield i, node
+            for i in self.delGeneJobs:
+                if i not in geneHits:
+                    yield i, node
+
+        mrnaHits = {}   # job index -> 命中的转录本
+        for mrna in summary['mrna']:
+            for i in self.mrnaMap.get(mrna, ()):
+                mrnaHits.setdefault(i, set()).add(mrna)
+        mrnas = set(summary['mrna'])
+        for i, common in mrnaHits.items():
+            yield i, selectmRNA(node, mrnas, common, self.gffnode.getInfo, self.jobs[i]['functype'])
+        for i in self.delmRNAJobs:
+            if i not in mrnaHits:
+                yield i, node
 
-def checkGene(summary: dict, target: list, functype: str, keeplist) -> bool:
+    def search(self):
+        # 与单次运行一致: 输出以 .gz 结尾的任务使用 bgzf
+        outs = [
+            open_output(job['output'], self.compress or ('bgzf' if job['output'].endswith('.gz') else None),
+                        buffer_size=BATCH_WRITE_BUFFER)
+            for job in self.jobs
+        ]
+        try:
+            with open_input(self.ingffPath, threads=self.threads) as ingff:
+                for node in self.parse(ingff):
+                    if not node:
+                        continue
+                    for i, lines in self.route(node):
+                        outs[i].writelines(lines)
+        finally:
+            for out in outs:
+                out.close()
+
+
+_worker = None
+
+
+def _initWorker(gff):
+    global _worker
+    _worker = gff
+
+
+def _searchChunk(ingff, shard, tmpdir):
+    part = os.path.join(tmpdir, f'{shard.index}.part')
+    with open(part, 'w', buffering=WRITE_BUFFER) as out:
+        for lines in _worker.filter(_worker.parse(map(decode_line, read_range(ingff, shard)))):
+            out.writelines(lines)
+    return part
+
+
+def getBatchJobs(batchfile, targettype, functype) -> list:
+    """
+    读取批量任务文件, 每行一个任务: list\toutput[\tfish/del[\tgene/mrna]]
+    缺省的模式和 id 类型使用命令行 -f, -t 参数
+    """
+    jobs = []
+    with open(batchfile, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            lines = line.split('\t')
+            job = {
+                'list': lines[0],
+                'output': lines[1],
+                'functype': lines[2] if len(lines) > 2 else functype,
+                'targettype': safeLower(lines[3]) if len(lines) > 3 else targettype,
+            }
+            if job['functype'] not in ('fish', 'del'):
+                raise ValueError(f"Invalid operation type in batch file: {line}")
+            if job['targettype'] not in ('gene', 'mrna'):
+                raise ValueError(f"Invalid target id type in batch file: {line}")
+            jobs.append(job)
+    if not jobs:
+        raise ValueError("Batch file is empty or invalid")
+    return jobs
+
+
+def checkGene(summary: dict, target: frozenset, functype: str, keeplist) -> bool:
     if keeplist:
         if summary['gene'] in target or any(x in keeplist for x in summary['mrna']):
             return True
@@ -144,11 +597,11 @@ def checkGene(summary: dict, target: list, functype: str, keeplist) -> bool:
         return False
 
 
-def mergeTarget(target: list, keeplist, functype: str) -> list:
+def mergeTarget(target: frozenset, keeplist, functype: str) -> frozenset:
     if functype == 'fish':
-        updated_list = list(set(target) | set(keeplist))
+        updated_list = frozenset(target) | frozenset(keeplist)
     elif functype == 'del':
-        updated_list = list(set(target) - set(keeplist))
+        updated_list = frozenset(target) - frozenset(keeplist)
     else:
         # 由于传参时加了choice, 实际不会触发
         raise ValueError(
@@ -157,55 +610,62 @@ def mergeTarget(target: list, keeplist, functype: str) -> list:
     return updated_list
 
 
-def checkmRNA(node, summary: dict, info: list, target: list, functype: str, keeplist) -> list:
+def checkmRNA(node, summary: dict, getInfo, target: frozenset, functype: str, keeplist=None) -> list:
+    """
+    getInfo: 返回节点逐行解析结果的函数, 仅当基因部分转录本命中(需拆分可变剪切)时调用
+    """
+    # 保留列表应在调用前通过 mergeTarget 合并, 避免每个节点重复合并
     if keeplist:
-        newTarget = set(mergeTarget(target, keeplist, functype))
-    else:
-        newTarget = target
+        target = mergeTarget(target, keeplist, functype)
 
     # 取交集mRNA id
-    common = set(newTarget) & set(summary['mrna'])
+    mrnas = set(summary['mrna'])
+    common = mrnas & target  # 集合求交集, 遍历较小的一方
+    return selectmRNA(node, mrnas, common, getInfo, functype)
+
 
+def selectmRNA(node, mrnas: set, common: set, getInfo, functype: str) -> list:
+    """依据命中的转录本 common 决定节点的去留或拆分"""
     # 如果没有交集
     if not common:
         if functype == 'fish':
-            return ''
+            return []
         else:
             return node
 
     # 如果交集等于全部mRNA id
-    elif common == set(summary['mrna']):
+    elif common == mrnas:
         if functype == 'fish':
             return node
         else:
-            return ''
+            return []
 
     # 有一部分交集，基因包含可变剪切且需要筛选
     elif functype == 'fish':
-        return _checkInfoFish(info, list(common))
+        return _checkInfoFish(getInfo(), common)
     else:
-        return _checkInfoDel(info, list(common))
+        return _checkInfoDel(getInfo(), common)
 
 
-def _checkInfoFish(info, common: list):
-    out = ''
+def _checkInfoFish(info, common: set) -> list:
+    out = []
     for i in info:
         if i['type'] == Type.gene or i['type'] == Type.pseudogene:
-            out += i['line']
+            out.append(i['line'])
         elif i['id'] in common or i['parent'][0] in common:
-            out += i['line']
+            out.append(i['line'])
     return out
 
 
-def _checkInfoDel(info, common: list):
-    out = ''
+def _checkInfoDel(info, common: set) -> list:
+    out = []
     for i in info:
         if i['type'] == Type.gene or i['type'] == Type.pseudogene:
-            out += i['line']
+            out.append(i['line'])
         elif i['id'] in common or i['parent'][0] in common:
             continue
         else:
-            out += i['line']
+            out.append(i['line'])
     return out
 
 
@@ -221,24 +681,62 @@ def main():
 
     # 添加参数
     parser.add_argument('-ig', help='input gff file', type=str, required=True)
-    parser.add_argument('-og', help='output gff file', type=str, required=True)
+    parser.add_argument('-og', help='output gff file', type=str)
     parser.add_argument(
-        '-l', help='target list file, single line', type=str, required=True)
+        '-l', help='target list file, single line', type=str)
     parser.add_argument('-t', help='target list id type, mrna or gene',
-                        type=str, required=True, choices=['mrna', 'gene'])
+                        type=str, choices=['mrna', 'gene'])
     parser.add_argument('-f', help='function select, del or fish',
                         type=str, required=False, default='fish', choices=['del', 'fish'])
     parser.add_argument('-k', help='a list of tr id, will keep parent gene',
                         default='', type=str, required=False)
+    parser.add_argument('-r', help='region bed file, use genes/mrnas overlapping these regions as targets instead of -l',
+                        type=str, required=False)
+    parser.add_argument('-a', help='attribute filters of gene (-t gene) or mrna (-t mrna) lines, all must match: '
+                        'key=value, key@file (value in list file) or key~regex, e.g. gene_biotype=protein_coding',
+                        nargs='+', type=str, required=False)
+    parser.add_argument('-b', help='batch file, one job per line: list\toutput[\tfish/del[\tgene/mrna]], '
+                        'missing columns use -f/-t; all jobs are done in one pass, -og/-l are ignored',
+                        type=str, required=False)
+    parser.add_argument('-p', help='process number, split gff by gene blocks and filter in parallel, default = 1',
+                        type=int, default=1, required=False)
+    parser.add_argument('--bgzf', help='write bgzf compressed output (tabix ready), also used when -og (or a batch output) ends with .gz',
+                        action='store_true', default=False)
+    parser.add_argument('--index', help='fish with offset index (ingff.fgi), build or rebuild it automatically',
+                        action='store_true', default=False)
+    parser.add_argument('--build_index', help='only build offset index (ingff.fgi) and exit',
+                        action='store_true', default=False)
+    add_metrics_arguments(parser)
 
     # 解析命令行参数
     args = parser.parse_args()
 
-    # 创建 Gff 实例
-    gff = Gff(args.ig, args.og, args.l, args.t, args.f, args.k)
+    bgzf = args.bgzf or (args.og or '').endswith('.gz')
+    metrics = metrics_from_args(args, 'fish_del_gff')
+
+    if args.build_index:
+        if detect_format(args.ig) != 'plain':
+            parser.error('offset index is only supported for uncompressed gff')
+        with metrics.stage('build_index') as stage:
+            print(f'index saved to {buildIndex(args.ig)}')
+            stage.add(nbytes=file_size(args.ig))
+        metrics.close()
+        return
+    if not args.b and not (args.og and (args.l or args.r or args.a) and args.t):
+        parser.error('the following arguments are required: -og, -l (or -r/-a), -t')
+
+    # 创建 Gff 实例, 读取目标列表/区间/索引
+    with metrics.stage('load'):
+        if args.b:
+            gff = GffBatch(args.ig, args.b, args.t, args.f, args.k, args.p, args.bgzf)
+        else:
+            gff = Gff(args.ig, args.og, args.l, args.t, args.f, args.k, args.index, args.p, args.r, args.a, bgzf)
 
     # 执行 search
-    gff.search()
+    with metrics.stage('search') as stage:
+        gff.search()
+        stage.add(nbytes=file_size(args.ig))
+    metrics.close()
 
 
 if __name__ == '__main__':
@@ -3,6 +3,10 @@ import os
 import sys
 import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "standard_module"))
+from my_file_io import open_input  # noqa: E402
+from my_metrics import add_metrics_arguments, file_size, metrics_from_args  # noqa: E402
+
 #### info ####
 __author__ = "zhongsiwang"
 __date__ = "20231009"
@@ -52,8 +56,8 @@ class Agp:
         :raises PermissionError: 如果没有文件的访问权限.
         """
         try:
-            self.size = open(size, "r", encoding="utf-8")
-            self.yahs = open(yahs, "r", encoding="utf-8")
+            self.size = open_input(size, encoding="utf-8")
+            self.yahs = open_input(yahs, encoding="utf-8")
             self.split_log = open(split_log, "w", encoding="utf-8")
             self.split_bed = open(split_bed, "w", encoding="utf-8")
             self.agp4 = open(agp4, "w", encoding="utf-8")
@@ -283,14 +287,19 @@ def main():
         required=False,
         default=1000000,
     )
+    add_metrics_arguments(parser)
     args = parser.parse_args()
+    metrics = metrics_from_args(args, "format_agp_from_Yahs")
 
     splitlog = os.path.join(args.o, "Genome_split.log")
     splitbed = os.path.join(args.o, "Genome_split.contig.bed")
     agp4 = os.path.join(args.o, "chr.order.agp")
 
-    agp = Agp(args.s, args.i, agp4, splitlog, splitbed, args.c, args.a)
-    agp.run()
+    with metrics.stage("run") as stage:
+        agp = Agp(args.s, args.i, agp4, splitlog, splitbed, args.c, args.a)
+        agp.run()
+        stage.add(lines=len(agp._info), nbytes=file_size(args.i))
+    metrics.close()
 
 
 if __name__ == "__main__":
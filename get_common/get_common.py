@@ -0,0 +1,270 @@
+##### import #####
+import os
+import sys
+import glob
+import time
+import heapq
+import argparse
+import tempfile
+import itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "standard_module"))
+from my_file_io import open_input, open_output  # noqa: E402
+
+#### info ####
+__author__ = "wangzhsi"
+__mail__ = "wang_zsi@outlook.com"
+__date__ = "20261019"
+__version__ = "1.0"
+
+#### main ####
+MODES = ("intersect", "union", "difference", "count")
+CHUNK_LINES = 5_000_000  # 外部排序时每个临时块的行数
+MAX_MEMORY = 2048  # MB, 输入总大小超过此值时使用外部排序
+
+
+def iter_keys(path, column=0, header=False):
+    """逐行产出指定列 (0-based), 跳过空行及列数不足的行"""
+    with open_input(path) as f:
+        if header:
+            next(f, None)
+        for line in f:
+            columns = line.rstrip("\r\n").split("\t")
+            if len(columns) > column and columns[column]:
+                yield columns[column]
+
+
+class Progress:
+    """每个文件处理完成后在标准错误打印进度"""
+
+    def __init__(self, total, quiet=False):
+        self.total = total
+        self.quiet = quiet
+        self.done = 0
+        self.start = time.perf_counter()
+
+    def update(self, path, lines, keys):
+        self.done += 1
+        if not self.quiet:
+            print(
+                f"[{self.done}/{self.total}] {path}: {lines} lines, {keys} unique, "
+                f"{time.perf_counter() - self.start:.1f}s",
+                file=sys.stderr,
+            )
+
+
+def _count(iterable, counter):
+    for item in iterable:
+        counter[0] += 1
+        yield item
+
+
+###### hash mode ######
+def hash_intersect(files, column, header, progress):
+    """与 perl 版本一致: 从小文件开始, 交集为空时提前结束"""
+    files = sorted(files, key=os.path.getsize)
+    common = None
+    for path in files:
+        counter = [0]
+        if common is None:
+            common = dict.fromkeys(_count(iter_keys(path, column, header), counter))
+        else:
+            current = set(_count(iter_keys(path, column, header), counter))
+            common = {key: None for key in common if key in current}
+        progress.update(path, counter[0], len(common))
+        if not common:
+            break
+    return list(common or ())
+
+
+def hash_union(files, column, header, progress):
+    union = {}
+    for path in files:
+        counter = [0]
+        union.update(dict.fromkeys(_count(iter_keys(path, column, header), counter)))
+        progress.update(path, counter[0], len(union))
+    return list(union)
+
+
+def hash_difference(files, column, header, progress):
+    """第一个文件中存在, 其余文件中均不存在"""
+    counter = [0]
+    rest = dict.fromkeys(_count(iter_keys(files[0], column, header), counter))
+    progress.update(files[0], counter[0], len(rest))
+    for path in files[1:]:
+        counter = [0]
+        for key in _count(iter_keys(path, column, header), counter):
+            rest.pop(key, None)
+        progress.update(path, counter[0], len(rest))
+        if not rest:
+            break
+    return list(rest)
+
+
+def hash_count(files, column, header, progress):
+    """每个 key 出现在哪些文件中, 以 bit 位记录"""
+    presence = {}
+    for i, path in enumerate(files):
+        bit = 1 << i
+        counter = [0]
+        for key in _count(iter_keys(path, column, header), counter):
+            presence[key] = presence.get(key, 0) | bit
+        progress.update(path, counter[0], len(presence))
+    return presence.items()
+
+
+###### external mode ######
+def _write_run(keys, tmpdir):
+    fd, path = tempfile.mkstemp(suffix=".run", dir=tmpdir)
+    with os.fdopen(fd, "w") as f:
+        f.writelines(key + "\n" for key in sorted(set(keys)))
+    return path
+
+
+def _iter_run(path, bit=None):
+    """逐行读取有序文件; 指定 bit 时产出 (key, bit)"""
+    with open(path) as f:
+        if bit is None:
+            for line in f:
+                yield line[:-1]
+        else:
+            for line in f:
+                yield line[:-1], bit
+
+
+def sort_unique(path, column, header, tmpdir, chunk_lines, progress):
+    """
+    外部排序: 每 chunk_lines 行排序去重后写入临时文件, 再 k 路归并为一个有序去重文件,
+    内存占用只与 chunk_lines 有关
+    """
+    counter = [0]
+    keys = _count(iter_keys(path, column, header), counter)
+    runs = []
+    while True:
+        chunk = list(itertools.islice(keys, chunk_lines))
+        if not chunk:
+            break
+        runs.append(_write_run(chunk, tmpdir))
+    fd, merged = tempfile.mkstemp(suffix=".sorted", dir=tmpdir)
+    unique = 0
+    with os.fdopen(fd, "w") as out:
+        previous = None
+        for key in heapq.merge(*(_iter_run(run) for run in runs)):
+            if key != previous:
+                out.write(key + "\n")
+                unique += 1
+                previous = key
+    for run in runs:
+        os.remove(run)
+    progress.update(path, counter[0], unique)
+    return merged
+
+
+def external_presence(files, column, header, tmpdir, chunk_lines, progress):
+    """各文件排序去重后 k 路归并, 按 key 有序产出 (key, 出现文件的 bit 位)"""
+    sorted_files = [sort_unique(path, column, header, tmpdir, chunk_lines, progress) for path in files]
+    streams = [_iter_run(path, 1 << i) for i, path in enumerate(sorted_files)]
+    for key, group in itertools.groupby(heapq.merge(*streams), key=lambda x: x[0]):
+        mask = 0
+        for _, bit in group:
+            mask |= bit
+        yield key, mask
+
+
+def select(mode, presence, number):
+    """依据 bit 位筛选 key"""
+    full = (1 << number) - 1
+    for key, mask in presence:
+        if mode == "intersect" and mask == full:
+            yield key
+        elif mode == "union":
+            yield key
+        elif mode == "difference" and mask == 1:
+            yield key
+
+
+###### output ######
+def write_keys(keys, output):
+    with open_output(output, "auto") as out:
+        out.writelines(key + "\n" for key in keys)
+
+
+def write_count(presence, files, output):
+    """id, 出现的文件数, 每个文件是否存在 (0/1)"""
+    with open_output(output, "auto") as out:
+        out.write("\t".join(["#id", "count"] + [os.path.basename(f) for f in files]) + "\n")
+        for key, mask in presence:
+            flags = [(mask >> i) & 1 for i in range(len(files))]
+            out.write(f"{key}\t{sum(flags)}\t" + "\t".join(map(str, flags)) + "\n")
+
+
+def get_input_files(patterns):
+    files = []
+    for pattern in patterns:
+        matched = sorted(glob.glob(pattern))
+        files.extend(matched if matched else [pattern])
+    return files
+
+
+def main():
+    function = "this program is used to get intersect/union/difference/count of multi lists"
+    parser = argparse.ArgumentParser(
+        description=function,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"author:\t{__author__}\nmail:\t{__mail__}\ndate:\t{__date__}\nversion:\t{__version__}\nfunction:\t{function}",
+    )
+    parser.add_argument("-i", "--input", nargs="+", required=True, help="input files, wildcard supported")
+    parser.add_argument("-o", "--output", required=True, help="output file")
+    parser.add_argument(
+        "-m", "--mode", choices=MODES, default="intersect",
+        help="intersect: in all files; union: in any file; difference: in first file only; "
+        "count: presence of each id in each file; default: intersect",
+    )
+    parser.add_argument("-c", "--column", type=int, default=1, help="id column (1-based), default: 1")
+    parser.add_argument("--header", action="store_true", default=False, help="skip the first line of each file")
+    parser.add_argument(
+        "--external", action="store_true", default=False,
+        help="sort chunks to disk and k-way merge, memory does not grow with input; "
+        "used automatically when total input size > --max_memory",
+    )
+    parser.add_argument(
+        "--max_memory", type=int, default=MAX_MEMORY,
+        help=f"MB, switch to external mode when total input size is larger, default: {MAX_MEMORY}",
+    )
+    parser.add_argument(
+        "--chunk_lines", type=int, default=CHUNK_LINES,
+        help=f"lines per sorted chunk in external mode, default: {CHUNK_LINES}",
+    )
+    parser.add_argument("--tmpdir", default=None, help="temp dir of external mode, default: dir of output")
+    parser.add_argument("-q", "--quiet", action="store_true", default=False, help="do not print progress")
+    args = parser.parse_args()
+
+    files = get_input_files(args.input)
+    missing = [f for f in files if not os.path.isfile(f)]
+    if missing:
+        parser.error(f"input files not found: {' '.join(missing)}")
+    if args.column < 1:
+        parser.error("-c/--column should be >= 1")
+    column = args.column - 1
+    progress = Progress(len(files), args.quiet)
+
+    total_size = sum(os.path.getsize(f) for f in files)
+    if args.external or total_size > args.max_memory * 1024 * 1024:
+        tmpdir = args.tmpdir or os.path.dirname(os.path.abspath(args.output))
+        with tempfile.TemporaryDirectory(prefix="get_common.", dir=tmpdir) as workdir:
+            presence = external_presence(files, column, args.header, workdir, args.chunk_lines, progress)
+            if args.mode == "count":
+                write_count(presence, files, args.output)
+            else:
+                write_keys(select(args.mode, presence, len(files)), args.output)
+    elif args.mode == "count":
+        write_count(hash_count(files, column, args.header, progress), files, args.output)
+    else:
+        func = {"intersect": hash_intersect, "union": hash_union, "difference": hash_difference}[args.mode]
+        write_keys(func(files, column, args.header, progress), args.output)
+
+    print(f"{args.mode} result saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+##### import #####
+import os
+import sys
+import argparse
+import multiprocessing
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "standard_module"))
+from my_file_io import open_input  # noqa: E402
+from my_metrics import add_metrics_arguments, file_size, metrics_from_args  # noqa: E402
+
+#### info ####
+__author__ = "wangzhsi"
+__mail__ = "wang_zsi@outlook.com"
+__date__ = "20261019"
+__version__ = "1.0"
+
+#### main ####
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+COLUMNS = ("Pan", "Core", "SoftCore", "Private")
+LOAD_CHUNK = 10000  # 读取计数表时每次转换的行数
+
+_shared = {}  # 子进程中的共享数据, 由 _init_worker 设置
+
+
+def load_presence(path: str):
+    """
+    读取 Orthogroups.GeneCount.tsv (可压缩), 去掉 Total 列
+    return: orthogroups, samples, presence (orthogroup x sample, bool)
+    """
+    with open_input(path) as f:
+        samples = f.readline().rstrip("\r\n").split("\t")[1:]
+        if samples and samples[-1] == "Total":
+            samples = samples[:-1]
+        n = len(samples)
+        orthogroups, blocks, chunk = [], [], []
+        for line in f:
+            fields = line.rstrip("\r\n").split("\t")
+            if len(fields) < n + 1:
+                continue
+            orthogroups.append(fields[0])
+            chunk.append(fields[1:n + 1])
+            if len(chunk) >= LOAD_CHUNK:
+                blocks.append(np.array(chunk, dtype=np.int64) > 0)
+                chunk = []
+        if chunk:
+            blocks.append(np.array(chunk, dtype=np.int64) > 0)
+    presence = np.concatenate(blocks) if blocks else np.zeros((0, n), dtype=bool)
+    return orthogroups, samples, presence
+
+
+def pack_presence(presence: np.ndarray) -> np.ndarray:
+    """每个样本的 orthogroup 有无按 bit 压缩: sample x ceil(orthogroup / 8), uint8"""
+    return np.packbits(presence.T, axis=1)
+
+
+def thresholds(n_samples: int, softcore: float, private: float):
+    """
+    第 j 个样本加入后 (j = 1..n) 的 softcore/private 样本数阈值, 与 orthoPanCore.R 一致:
+    softcore: >= round(j * softcore); private: == max(round(j * private), 1)
+    """
+    steps = range(1, n_samples + 1)
+    soft = np.array([max(round(j * softcore), 1) for j in steps], dtype=np.uint16)
+    priv = np.array([max(round(j * private), 1) for j in steps], dtype=np.uint16)
+    return soft, priv
+
+
+def _init_worker(bits, n_genes, soft, priv):
+    _shared.update(bits=bits, n_genes=n_genes, soft=soft, priv=priv)
+
+
+def simulate_batch(perms: np.ndarray) -> np.ndarray:
+    """
+    一批随机顺序同时计算: pan/core 为压缩 bit 的累积 OR/AND 后计数,
+    softcore/private 需要每个 orthogroup 的累积样本数
+    :param perms: batch x sample, 样本加入顺序
+    return: batch x sample x 4 (Pan, Core, SoftCore, Private)
+    """
+    bits, n_genes = _shared["bits"], _shared["n_genes"]
+    soft, priv = _shared["soft"], _shared["priv"]
+    batch, n_samples = perms.shape
+    cum_or = np.zeros((batch, bits.shape[1]), dtype=np.uint8)
+    cum_and = np.full((batch, bits.shape[1]), 0xFF, dtype=np.uint8)
+    counts = np.zeros((batch, n_genes), dtype=np.uint16)
+    result = np.empty((batch, n_samples, len(COLUMNS)), dtype=np.int64)
+    for j in range(n_samples):
+        added = bits[perms[:, j]]
+        cum_or |= added
+        cum_and &= added  # packbits 补齐的 bit 为 0, 第一次 AND 后即清零
+        counts += np.unpackbits(added, axis=1, count=n_genes)
+        result[:, j, 0] = POPCOUNT[cum_or].sum(axis=1)
+        result[:, j, 1] = POPCOUNT[cum_and].sum(axis=1)
+        result[:, j, 2] = np.count_nonzero(counts >= soft[j], axis=1)
+        result[:, j, 3] = np.count_nonzero(counts == priv[j], axis=1)
+    return result
+
+
+def simulate(
+    presence: np.ndarray,
+    simulation: int = 100,
+    softcore: float = 0.9,
+    private: float = 0.01,
+    processes: int = 1,
+    batch_size: int = 16,
+    seed=None,
+) -> np.ndarray:
+    """
+    随机加入样本的 pan/core/softcore/private 曲线;
+    随机顺序在主进程中生成, 结果与进程数无关 (指定 seed 时可重复)
+    return: simulation x sample x 4
+    """
+    n_genes, n_samples = presence.shape
+    rng = np.random.default_rng(seed)
+    perms = np.argsort(rng.random((simulation, n_samples)), axis=1)
+    batches = [perms[i:i + batch_size] for i in range(0, simulation, batch_size)]
+    initargs = (pack_presence(presence), n_genes) + thresholds(n_samples, softcore, private)
+    if processes <= 1 or len(batches) <= 1:
+        _init_worker(*initargs)
+        results = [simulate_batch(batch) for batch in batches]
+    else:
+        with multiprocessing.Pool(min(processes, len(batches)), _init_worker, initargs) as pool:
+            results = pool.map(simulate_batch, batches)
+    return np.concatenate(results) if results else np.zeros((0, n_samples, len(COLUMNS)), dtype=np.int64)
+
+
+def write_simulation(result: np.ndarray, output: str):
+    """与 orthoPanCore.R 中的模拟结果一致: samples (模拟编号), sampleNum, Pan, Core, SoftCore, Private"""
+    simulation, n_samples, _ = result.shape
+    sample_num = np.arange(1, n_samples + 1)
+    with open(output, "w") as f:
+        f.write("\t".join(("samples", "sampleNum") + COLUMNS) + "\n")
+        for i in range(simulation):
+            table = np.column_stack((np.full(n_samples, i + 1), sample_num, result[i]))
+            np.savetxt(f, table, fmt="%d", delimiter="\t")
+
+
+def main():
+    function = "this program is used to simulate pan/core/softcore/private curves from Orthogroups.GeneCount.tsv"
+    parser = argparse.ArgumentParser(
+        description=function,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"author:\t{__author__}\nmail:\t{__mail__}\ndate:\t{__date__}\nversion:\t{__version__}\nfunction:\t{function}",
+    )
+    parser.add_argument("-i", "--input", required=True, help="Orthogroups.GeneCount.tsv file from orthofinder")
+    parser.add_argument("-o", "--outdir", required=True, help="Output dir, will save ${outdir}/PanCoreSimulation.txt")
+    parser.add_argument("-s", "--simulation", type=int, default=100, help="simulation number, default: 100")
+    parser.add_argument("--softcore", type=float, default=0.9, help="Softcore genome threshold, default: 0.9")
+    parser.add_argument("--private", type=float, default=0.01, help="Private genome threshold (minimum 1 sample), default: 0.01")
+    parser.add_argument("-p", "--processes", type=int, default=1, help="Process number, default: 1")
+    parser.add_argument("--batch", type=int, default=16, help="simulations computed together in one process, default: 16")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, default: random")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    metrics = metrics_from_args(args, "pan_core_simulation")
+
+    os.makedirs(args.outdir, exist_ok=True)
+    with metrics.stage("load") as stage:
+        orthogroups, samples, presence = load_presence(args.input)
+        stage.add(lines=len(orthogroups), nbytes=file_size(args.input))
+    print(f"{len(orthogroups)} orthogroups, {len(samples)} samples")
+    with metrics.stage("simulate"):
+        result = simulate(
+            presence, args.simulation, args.softcore, args.private, args.processes, max(args.batch, 1), args.seed
+        )
+    output = os.path.join(args.outdir, "PanCoreSimulation.txt")
+    with metrics.stage("write"):
+        write_simulation(result, output)
+    print(f"simulation result saved to {output}")
+    metrics.close()
+
+
+if __name__ == "__main__":
+    main()
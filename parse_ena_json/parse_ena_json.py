@@ -1,10 +1,35 @@
+import io
+import os
+import re
+import sys
 import json
+import time
+import heapq
+import asyncio
+import sqlite3
+import hashlib
 import argparse
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "standard_module"))
+from my_metrics import add_metrics_arguments, file_size, metrics_from_args  # noqa: E402
 
 
 # envs
 ASCP = "ascp"
 ASPERA_KEY = "key"
+CHUNK_SIZE = 1 << 20  # read metadata 1M characters at a time
+DOWNLOAD_CHUNK = 1 << 20  # download 1M bytes at a time
+RETRY_BACKOFF = 2  # seconds, doubled on every retry
+ENA_PORTAL = "https://www.ebi.ac.uk/ena/portal/api/filereport"
+ENA_FIELDS = (
+    "run_accession,sample_accession,experiment_accession,study_accession,"
+    "scientific_name,library_strategy,fastq_ftp,fastq_aspera,fastq_md5,fastq_bytes"
+)
 
 #### info ####
 __author__ = "wangzhsi"
@@ -13,34 +38,512 @@ __date__ = "20240909"
 __version__ = "1.0"
 
 
-def filter_data(data, filters):
-    if not filters:
-        return data
-    filter_data = []
+def iter_json(f, chunk_size=CHUNK_SIZE):
+    """
+    Incrementally decode records from a JSON array or JSON Lines stream.
+    Records are decoded one by one with raw_decode over buffered chunks,
+    so memory is bounded by the chunk size and the largest record.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    while True:
+        # skip array brackets, separators and blank between records
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos < len(buffer):
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # a value (e.g. a number) ending at the buffer edge may be incomplete, read more first
+                if eof or (end < len(buffer) and buffer[end] in " \t\r\n,]"):
+                    yield record
+                    pos = end
+                    continue
+        elif eof:
+            return
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_tsv(f):
+    """Decode records from ENA filereport TSV, the first line is the header"""
+    header = f.readline().rstrip("\r\n").split("\t")
+    for line in f:
+        line = line.rstrip("\r\n")
+        if not line:
+            continue
+        yield dict(zip(header, line.split("\t")))
+
+
+def iter_records(path):
+    """Yield metadata records from JSON, JSON Lines or ENA TSV, detected by the first character"""
+    with open(path, "r") as f:
+        head = f.read(CHUNK_SIZE).lstrip()[:1]
+        f.seek(0)
+        if head in ("[", "{"):
+            yield from iter_json(f)
+        elif head:
+            yield from iter_tsv(f)
+
+
+def load_values(path):
+    """Load a membership list, first column of each line, into a hash set"""
+    values = set()
+    with open(path, "r") as f:
+        for line in f:
+            value = line.strip().split("\t", 1)[0]
+            if value:
+                values.add(value)
+    return frozenset(values)
+
+
+def compile_filter(expr):
+    """
+    Compile one filter expression into a check on a record:
+        key=value   exact match
+        key@file    value in the list file (one value per line)
+        key^prefix  value starts with prefix
+        key~regex   value matches regex
+    """
+    match = re.match(r"^(\w+)([=@^~])(.*)$", expr)
+    if not match:
+        raise ValueError(f"Invalid filter: {expr}")
+    key, op, value = match.groups()
+    value = value.strip('"')
+    if op == "=":
+        return lambda record: record.get(key) == value
+    if op == "@":
+        values = load_values(value)
+        return lambda record: record.get(key) in values
+    if op == "^":
+        return lambda record: str(record.get(key, "")).startswith(value)
+    pattern = re.compile(value)
+    return lambda record: pattern.search(str(record.get(key, ""))) is not None
+
+
+def compile_filters(exprs):
+    """Compile all filters into one predicate, a record must match every filter"""
+    if not exprs:
+        return None
+    checks = [compile_filter(expr) for expr in exprs]
+    if len(checks) == 1:
+        return checks[0]
+    return lambda record: all(check(record) for check in checks)
+
+
+def filter_data(data, predicate):
+    if predicate is None:
+        yield from data
+        return
     for record in data:
-        match = all(record.get(key) == value for key, value in filters.items())
-        if match:
-            filter_data.append(record)
-    return filter_data
+        if predicate(record):
+            yield record
 
 
-def generate_command(data, download_method, output_dir):
-    commands = []
+def iter_fastq(data, download_method="ftp"):
+    """Yield one item per fastq file with its address, md5 and size (fastq_md5/fastq_bytes)"""
+    field = "fastq_ftp" if download_method == "ftp" else "fastq_aspera"
     for record in data:
-        if download_method == "ftp":
-            fastq_url = record["fastq_ftp"]
-            urls = fastq_url.split(";")
-            for url in urls:
-                commands.append(f"wget -P {output_dir}/ {url}")
-        elif download_method == "ascp":
-            fastq_url = record["fastq_aspera"]
-            urls = fastq_url.split(";")
-            for url in urls:
-                commands.append(
-                    f"{ASCP} -QT -l 300m -P33001 -i {ASPERA_KEY} era-fasp@{url} {output_dir}/"
-                )
-    for command in commands:
-        print(command)
+        urls = record[field].split(";")
+        md5s = record.get("fastq_md5", "").split(";")
+        sizes = record.get("fastq_bytes", "").split(";")
+        for i, url in enumerate(urls):
+            if not url:
+                continue
+            size = sizes[i] if i < len(sizes) else ""
+            yield {
+                "url": url,
+                "name": os.path.basename(url),
+                "md5": md5s[i] if i < len(md5s) else "",
+                "size": int(size) if size.isdigit() else 0,
+            }
+
+
+def format_command(item, download_method, output_dir):
+    if download_method == "ftp":
+        return f"wget -P {output_dir}/ {item['url']}"
+    return f"{ASCP} -QT -l 300m -P33001 -i {ASPERA_KEY} era-fasp@{item['url']} {output_dir}/"
+
+
+class ChecksumCache:
+    """
+    Persistent md5 cache of local files: path\tsize\tmtime_ns\tmd5.
+    A cached md5 is reused while the file size and mtime are unchanged.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.changed = False
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) == 4:
+                        self.entries[parts[0]] = (int(parts[1]), int(parts[2]), parts[3])
+
+    def md5(self, path):
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.entries.get(key)
+        if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return entry[2]
+        md5 = md5_file(path).hexdigest()
+        self.entries[key] = (stat.st_size, stat.st_mtime_ns, md5)
+        self.changed = True
+        return md5
+
+    def update(self, path, md5):
+        stat = os.stat(path)
+        self.entries[os.path.abspath(path)] = (stat.st_size, stat.st_mtime_ns, md5)
+        self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            for key, (size, mtime, md5) in self.entries.items():
+                f.write(f"{key}\t{size}\t{mtime}\t{md5}\n")
+        os.replace(tmp, self.path)
+        self.changed = False
+
+
+def is_downloaded(item, output_dir, cache):
+    """A local file is complete when its size and md5 match the record"""
+    path = os.path.join(output_dir, item["name"])
+    if not os.path.isfile(path) or not (item["size"] or item["md5"]):
+        return False
+    if item["size"] and os.path.getsize(path) != item["size"]:
+        return False
+    return not item["md5"] or cache.md5(path) == item["md5"]
+
+
+def skip_downloaded(items, output_dir, cache):
+    for item in items:
+        if cache is not None and is_downloaded(item, output_dir, cache):
+            print(f"skip existing: {item['name']}", file=sys.stderr)
+            continue
+        yield item
+
+
+def generate_command(data, download_method, output_dir, cache=None):
+    for item in skip_downloaded(iter_fastq(data, download_method), output_dir, cache):
+        print(format_command(item, download_method, output_dir))
+
+
+def balance_shards(items, shards):
+    """
+    Split items into shards with balanced total fastq_bytes,
+    greedy longest-first: the largest remaining file goes to the lightest shard
+    """
+    heap = [(0, i) for i in range(shards)]
+    result = [[] for _ in range(shards)]
+    totals = [0] * shards
+    for item in sorted(items, key=lambda x: x["size"], reverse=True):
+        total, i = heapq.heappop(heap)
+        result[i].append(item)
+        totals[i] = total + item["size"]
+        heapq.heappush(heap, (totals[i], i))
+    return result, totals
+
+
+def write_shards(data, download_method, output_dir, shards, prefix, cache=None):
+    """Write download commands into shards prefix_N.txt, one per node"""
+    items = skip_downloaded(iter_fastq(data, download_method), output_dir, cache)
+    groups, totals = balance_shards(items, shards)
+    for i, (group, total) in enumerate(zip(groups, totals)):
+        path = f"{prefix}_{i}.txt"
+        with open(path, "w") as f:
+            for item in group:
+                f.write(format_command(item, download_method, output_dir) + "\n")
+        print(f"{path}\t{len(group)} files\t{total} bytes")
+
+
+def md5_file(path, digest=None):
+    digest = digest or hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK), b""):
+            digest.update(chunk)
+    return digest
+
+
+def iter_download_tasks(data, output_dir, url_prefix="https://", cache=None):
+    """Yield one task per fastq file, with md5 from the record's fastq_md5"""
+    for item in skip_downloaded(iter_fastq(data, "ftp"), output_dir, cache):
+        url = item["url"]
+        yield {
+            "url": url if "://" in url else url_prefix + url,
+            "path": os.path.join(output_dir, item["name"]),
+            "md5": item["md5"],
+            "size": item["size"],
+        }
+
+
+class IncompleteDownload(OSError):
+    """Connection closed before the whole file arrived; the .part is kept so a retry resumes with Range"""
+
+
+def _expected_size(response, offset):
+    """Total file size announced by the server: Content-Range total for 206, else offset + Content-Length"""
+    if response.status == 206:
+        match = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", ""))
+        if match:
+            return int(match.group(1))
+    length = response.headers.get("Content-Length")
+    return offset + int(length) if length and length.isdigit() else 0
+
+
+def _fetch(url, part, md5, size, stats, timeout):
+    """
+    Download url into part, resuming with an HTTP Range request when part exists.
+    A short read raises IncompleteDownload and keeps part; part is only removed
+    when a complete file fails the md5 check or is larger than expected.
+    """
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code != 416 or not offset:
+            raise
+        response = None  # range not satisfiable, part is already complete
+
+    expected = size
+    if response is None:
+        digest = md5_file(part)
+    else:
+        with response:
+            if offset and response.status != 206:
+                offset = 0  # server ignored Range, start over
+            expected = _expected_size(response, offset) or size
+            digest = md5_file(part) if offset else hashlib.md5()
+            with open(part, "ab" if offset else "wb") as f:
+                try:
+                    while True:
+                        chunk = response.read(DOWNLOAD_CHUNK)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        digest.update(chunk)
+                        stats["transferred"] += len(chunk)
+                except http.client.HTTPException as e:  # e.g. IncompleteRead
+                    raise IncompleteDownload(f"connection lost: {url}: {e!r}") from e
+
+    received = os.path.getsize(part)
+    if size and expected and expected != size:
+        print(f"Warning: server size {expected} differs from fastq_bytes {size}: {url}", file=sys.stderr)
+    for total in (expected, size):
+        if total and received < total:
+            raise IncompleteDownload(f"incomplete download: {received}/{total} bytes: {url}")
+    if (size and received != size) or (expected and received != expected):
+        os.remove(part)
+        raise ValueError(f"size mismatch: {received} bytes, expected {size or expected}: {url}")
+    if md5 and digest.hexdigest() != md5:
+        os.remove(part)
+        raise ValueError(f"md5 mismatch: {url}")
+
+
+def download_file(task, retries=3, timeout=60):
+    """Download one file with resume, md5 check and retry with exponential backoff"""
+    part = task["path"] + ".part"
+    stats = {"transferred": 0}
+    result = {
+        "event": "file",
+        "url": task["url"],
+        "path": task["path"],
+        "md5": task["md5"],
+        "status": "failed",
+        "attempts": 0,
+    }
+    start = time.time()
+    for attempt in range(retries + 1):
+        result["attempts"] = attempt + 1
+        try:
+            _fetch(task["url"], part, task["md5"], task.get("size", 0), stats, timeout)
+            os.replace(part, task["path"])
+            result["status"] = "done"
+            result.pop("error", None)
+            break
+        except (OSError, ValueError) as e:  # URLError/HTTPError are OSError
+            result["error"] = str(e)
+            if attempt < retries:
+                time.sleep(RETRY_BACKOFF * 2**attempt)
+    seconds = time.time() - start
+    result["bytes"] = stats["transferred"]
+    result["seconds"] = round(seconds, 3)
+    result["mb_per_second"] = round(stats["transferred"] / 1024 / 1024 / seconds, 3) if seconds else 0.0
+    return result
+
+
+def download_all(data, output_dir, threads=4, retries=3, log_path=None, url_prefix="https://", cache=None):
+    """
+    Download all fastq files with a bounded thread pool.
+    One JSON line per finished file and a final summary line are appended to log_path.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    log_path = log_path or os.path.join(output_dir, "download_log.json")
+    summary = {"event": "summary", "files": 0, "done": 0, "failed": 0, "bytes": 0}
+    start = time.time()
+
+    with ThreadPoolExecutor(threads) as pool, open(log_path, "a") as log:
+
+        def collect(futures):
+            for future in futures:
+                result = future.result()
+                log.write(json.dumps(result) + "\n")
+                log.flush()
+                summary["files"] += 1
+                summary[result["status"]] += 1
+                summary["bytes"] += result["bytes"]
+                if cache is not None and result["status"] == "done" and result["md5"]:
+                    cache.update(result["path"], result["md5"])
+                print(f"{result['status']}\t{result['path']}\t{result['mb_per_second']} MB/s")
+
+        pending = set()
+        for task in iter_download_tasks(data, output_dir, url_prefix, cache):
+            pending.add(pool.submit(download_file, task, retries))
+            if len(pending) >= threads * 2:  # keep the task queue bounded
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(wait(pending)[0])
+
+        seconds = time.time() - start
+        summary["seconds"] = round(seconds, 3)
+        summary["mb_per_second"] = round(summary["bytes"] / 1024 / 1024 / seconds, 3) if seconds else 0.0
+        log.write(json.dumps(summary) + "\n")
+    return summary
+
+
+class MetadataCache:
+    """SQLite cache of ENA filereport responses keyed by accession, result and fields"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS filereport ("
+            "accession TEXT, result TEXT, fields TEXT, fetched REAL, body TEXT, "
+            "PRIMARY KEY (accession, result, fields))"
+        )
+
+    def get(self, accession, result, fields, max_age=None):
+        """Return the cached body, None when missing or older than max_age days"""
+        row = self.conn.execute(
+            "SELECT fetched, body FROM filereport WHERE accession=? AND result=? AND fields=?",
+            (accession, result, fields),
+        ).fetchone()
+        if row is None or (max_age is not None and time.time() - row[0] > max_age * 86400):
+            return None
+        return row[1]
+
+    def put(self, accession, result, fields, body):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO filereport VALUES (?, ?, ?, ?, ?)",
+            (accession, result, fields, time.time(), body),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def _get_filereport(portal, accession, result, fields, timeout=60):
+    query = urllib.parse.urlencode(
+        {"accession": accession, "result": result, "fields": fields, "format": "json"}
+    )
+    with urllib.request.urlopen(f"{portal}?{query}", timeout=timeout) as response:
+        return response.read().decode("utf-8")
+
+
+async def _fetch_filereports(accessions, cache, portal, result, fields, concurrency, retries):
+    """
+    Fetch missing accessions concurrently, at most `concurrency` requests in flight.
+    Return accessions that still failed after all retries, in input order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = set()
+
+    async def fetch(accession):
+        async with semaphore:
+            for attempt in range(retries + 1):
+                try:
+                    body = await asyncio.to_thread(
+                        _get_filereport, portal, accession, result, fields
+                    )
+                except OSError as e:  # URLError/HTTPError are OSError
+                    if attempt == retries:
+                        print(f"Warning: failed to fetch {accession}: {e}", file=sys.stderr)
+                        failed.add(accession)
+                        return
+                    await asyncio.sleep(RETRY_BACKOFF * 2**attempt)
+                else:
+                    break
+        cache.put(accession, result, fields, body)  # sqlite is only used from the event loop thread
+
+    await asyncio.gather(*(fetch(accession) for accession in accessions))
+    return [accession for accession in accessions if accession in failed]
+
+
+def fetch_metadata(
+    accessions,
+    cache_path,
+    portal=ENA_PORTAL,
+    result="read_run",
+    fields=ENA_FIELDS,
+    concurrency=8,
+    max_age=None,
+    retries=3,
+    failed=None,
+):
+    """
+    Yield records of study/sample/run accessions from the ENA portal filereport API.
+    Responses are cached in SQLite; only accessions missing from the cache,
+    or older than max_age days, are fetched again.
+    Accessions that cannot be fetched are appended to `failed` when a list is given,
+    otherwise a RuntimeError is raised before any record is yielded.
+    """
+    cache = MetadataCache(cache_path)
+    try:
+        missing = [a for a in accessions if cache.get(a, result, fields, max_age) is None]
+        if missing:
+            errors = asyncio.run(
+                _fetch_filereports(missing, cache, portal, result, fields, concurrency, retries)
+            )
+            if errors and failed is None:
+                raise RuntimeError(f"failed to fetch {len(errors)} accession(s): {' '.join(errors)}")
+            if errors:
+                failed.extend(errors)
+        for accession in accessions:
+            body = cache.get(accession, result, fields)
+            if body:
+                yield from iter_json(io.StringIO(body))
+    finally:
+        cache.close()
+
+
+def load_accessions(values):
+    """Accessions from the command line, 'file' entries prefixed with @ are read line by line"""
+    accessions = []
+    for value in values:
+        if value.startswith("@"):
+            with open(value[1:], "r") as f:  # keep file order, duplicates are removed below
+                for line in f:
+                    accession = line.strip().split("\t", 1)[0]
+                    if accession:
+                        accessions.append(accession)
+        else:
+            accessions.append(value)
+    return list(dict.fromkeys(accessions))
 
 
 def main():
@@ -52,7 +555,11 @@ def main():
     If filter multiple keys:
         python3 parse_ena_json.py -i metadata.json -m ascp -o output_dir -f sample_accession=SAMN12345678 experiment_accession=ERX12345678 ; 
     If space in the value:
-        python3 parse_ena_json.py -i metadata.json -m ascp -o output_dir -f scientific_name="Bos indicus"'''
+        python3 parse_ena_json.py -i metadata.json -m ascp -o output_dir -f scientific_name="Bos indicus" ; 
+    If filter by a list of accessions, prefix or regex:
+        python3 parse_ena_json.py -i metadata.json -m ftp -o output_dir -f run_accession@runs.txt study_accession^PRJEB "library_strategy~^(WGS|WXS)$" ; 
+    If fetch metadata from ENA portal instead of a local file:
+        python3 parse_ena_json.py -a PRJEB12345 PRJNA67890 @samples.txt -m ftp -o output_dir'''
 
     parser = argparse.ArgumentParser(
         description=function,
@@ -60,12 +567,15 @@ def main():
     )
 
     parser.add_argument(
-        "-i", "--input", required=True, help="Input JSON file containing metadata"
+        "-i",
+        "--input",
+        required=False,
+        help="Input metadata file: JSON, JSON Lines or ENA filereport TSV",
     )
     parser.add_argument(
         "-m",
         "--method",
-        required=True,
+        required=False,
         choices=["ftp", "ascp"],
         help="Download method: 'ftp' or 'ascp'",
         default="ftp",
@@ -81,23 +591,161 @@ def main():
         "-f",
         "--filter",
         nargs="*",
-        help="Optional filters in the format 'key=value'.",
+        help="Optional filters, all must match: 'key=value', 'key@file' (value in list file), "
+        "'key^prefix' or 'key~regex'.",
     )
 
+    parser.add_argument(
+        "-d",
+        "--download",
+        action="store_true",
+        default=False,
+        help="Download fastq_ftp files with the built-in concurrent downloader instead of printing commands",
+    )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        type=int,
+        default=4,
+        help="Concurrent downloads, default: 4",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Retries per file with exponential backoff, default: 3",
+    )
+    parser.add_argument(
+        "--log",
+        help="JSON lines log of download progress and throughput, default: output_dir/download_log.json",
+    )
+    parser.add_argument(
+        "--url_prefix",
+        default="https://",
+        help="Prefix added to fastq_ftp addresses, e.g. a local mirror or test server, default: 'https://'",
+    )
+
+    parser.add_argument(
+        "-n",
+        "--shards",
+        type=int,
+        default=0,
+        help="Split commands into N shards with balanced total fastq_bytes (longest first), "
+        "written to PREFIX_0.txt ... PREFIX_N-1.txt",
+    )
+    parser.add_argument(
+        "--prefix",
+        default="download_shard",
+        help="Prefix of shard files, default: download_shard",
+    )
+    parser.add_argument(
+        "--cache",
+        help="md5 cache of local files, default: output_dir/.fastq_md5_cache.tsv",
+    )
+    parser.add_argument(
+        "--no_skip",
+        action="store_true",
+        default=False,
+        help="Do not skip files already in output_dir with matching size and md5",
+    )
+
+    fetch_group = parser.add_argument_group(
+        "Fetch parameters", "Fetch metadata from ENA portal filereport API instead of -i"
+    )
+    fetch_group.add_argument(
+        "-a",
+        "--accession",
+        nargs="+",
+        help="Study/sample/run accessions, '@file' reads one accession per line",
+    )
+    fetch_group.add_argument(
+        "--result",
+        default="read_run",
+        help="Filereport result type, default: read_run",
+    )
+    fetch_group.add_argument(
+        "--fields",
+        default=ENA_FIELDS,
+        help="Filereport fields, comma-separated",
+    )
+    fetch_group.add_argument(
+        "--portal",
+        default=ENA_PORTAL,
+        help=f"Filereport endpoint, e.g. a local mock server, default: {ENA_PORTAL}",
+    )
+    fetch_group.add_argument(
+        "--db",
+        default="ena_metadata_cache.sqlite",
+        help="SQLite cache of fetched metadata, default: ena_metadata_cache.sqlite",
+    )
+    fetch_group.add_argument(
+        "--max_age",
+        type=float,
+        help="Refresh cached accessions older than this many days, default: never",
+    )
+    fetch_group.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Concurrent portal requests, default: 8",
+    )
+
+    add_metrics_arguments(parser)
     args = parser.parse_args()
+    if not args.input and not args.accession:
+        parser.error("one of -i/--input or -a/--accession is required")
+    metrics = metrics_from_args(args, "parse_ena_json")
+
+    fetch_failed = []
+    if args.accession:
+        data = fetch_metadata(
+            load_accessions(args.accession),
+            args.db,
+            args.portal,
+            args.result,
+            args.fields,
+            args.concurrency,
+            args.max_age,
+            args.retries,
+            fetch_failed,
+        )
+    else:
+        data = iter_records(args.input)
 
-    with open(args.input, "r") as f:
-        data = json.load(f)
+    predicate = compile_filters(args.filter)
 
-    filters = {}
-    if args.filter:
-        for f in args.filter:
-            key, value = f.split("=", 1)
-            filters[key] = value.strip('"')
+    # 元数据流式读取, 读取/过滤/输出均计入 run 阶段; lines 为读取的记录数
+    filtered_data = filter_data(metrics.counted(data, "run"), predicate)
 
-    filtered_data = filter_data(data, filters)
+    cache = None
+    if not args.no_skip:
+        cache = ChecksumCache(args.cache or os.path.join(args.output, ".fastq_md5_cache.tsv"))
 
-    generate_command(filtered_data, args.method, args.output)
+    try:
+        with metrics.stage("run") as stage:
+            if args.download:
+                summary = download_all(
+                    filtered_data, args.output, args.threads, args.retries, args.log, args.url_prefix, cache
+                )
+                print(json.dumps(summary))
+                if summary["failed"]:
+                    sys.exit(1)
+            elif args.shards > 0:
+                write_shards(filtered_data, args.method, args.output, args.shards, args.prefix, cache)
+            else:
+                generate_command(filtered_data, args.method, args.output, cache)
+            stage.add(nbytes=file_size(args.input))
+        if fetch_failed:
+            print(
+                f"Error: failed to fetch metadata of {len(fetch_failed)} accession(s), "
+                f"their records are missing from the output: {' '.join(fetch_failed)}",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+    finally:
+        if cache is not None and os.path.isdir(os.path.dirname(cache.path) or "."):
+            cache.save()
+        metrics.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,235 @@
+"""
+fasta 索引 (.fai, 与 samtools faidx 兼容) 的建立/读取, 以及基于 mmap 的按坐标取序列;
+仅支持未压缩 fasta, 取序列时只复制所需区间, 不读取整条序列
+
+usage:
+    fasta = open_fasta("genome.fa")  # 同一文件多次调用返回同一对象
+    seq = fasta.fetch("chr1", 1000, 2000)  # 0-based, 左闭右开
+    seq = fasta.fetch("chr1", 1000, 2000, "-")  # 反向互补
+"""
+import os
+import mmap
+import atexit
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+from my_file_io import detect_format
+
+SCAN_SIZE = 1 << 24  # 16M, 统计换行符时每次复制的字节数
+COMPLEMENT = bytes.maketrans(
+    b"ACGTUMRWSYKVHDBNacgtumrwsykvhdbn", b"TGCAAKYWSRMBDHVNtgcaakywsrmbdhvn"
+)
+
+_READERS = {}  # 绝对路径: FastaReader
+
+
+class FaiRecord(NamedTuple):
+    """name, 序列长度, 序列起始字节偏移, 每行碱基数, 每行字节数 (含换行符)"""
+
+    name: str
+    length: int
+    offset: int
+    linebases: int
+    linewidth: int
+
+    def to_line(self) -> str:
+        return "\t".join(map(str, self))
+
+
+def _count_newlines(mm, start: int, end: int) -> int:
+    """按块统计区间内的 \\n 及 \\r 数量, 内存占用不超过 SCAN_SIZE"""
+    n = 0
+    for pos in range(start, end, SCAN_SIZE):
+        chunk = mm[pos:min(pos + SCAN_SIZE, end)]
+        n += chunk.count(b"\n") + chunk.count(b"\r")
+    return n
+
+
+def _index_record(mm, name: str, start: int, end: int) -> FaiRecord:
+    """由序列区间 [start, end) 计算索引, 行长不一致时报错 (同 samtools)"""
+    while end > start and mm[end - 1] in b"\r\n":  # 忽略序列末尾的空行
+        end -= 1
+    if end == start:
+        return FaiRecord(name, 0, start, 0, 0)
+    first = mm.find(b"\n", start, end)
+    if first == -1:  # 单行序列, 行宽由序列后的换行符 (\r\n 或 \n) 决定
+        length = end - start
+        terminator = 2 if mm[end:end + 2] == b"\r\n" else 1
+        return FaiRecord(name, length, start, length, length + terminator)
+    linewidth = first - start + 1
+    linebases = linewidth - (2 if mm[first - 1:first] == b"\r" else 1)
+    span = end - start
+    lines = (span - 1) // linewidth + 1
+    length = span - _count_newlines(mm, start, end)
+    # 行长一致时, 碱基数由行数唯一确定, 且每行末尾均为换行符
+    expected = span - (lines - 1) * (linewidth - linebases)
+    if (
+        linebases <= 0
+        or length != expected
+        or length - (lines - 1) * linebases > linebases
+        or mm[first:start + (lines - 1) * linewidth:linewidth] != b"\n" * (lines - 1)
+    ):
+        raise ValueError(f"different line length in sequence '{name}'")
+    return FaiRecord(name, length, start, linebases, linewidth)
+
+
+def iter_records(mm) -> Iterator[FaiRecord]:
+    """一次扫描整个文件, header 及换行符查找均在 C 层完成"""
+    if mm[:1] == b">":
+        pos = 0
+    else:  # 跳过第一个 header 之前的内容
+        pos = mm.find(b"\n>")
+        if pos == -1:
+            return
+        pos += 1
+    size = len(mm)
+    while pos < size:
+        line_end = mm.find(b"\n", pos)
+        if line_end == -1:
+            line_end = size
+        fields = mm[pos + 1:line_end].split()
+        name = fields[0].decode() if fields else ""
+        next_header = mm.find(b"\n>", line_end)
+        seq_end = size if next_header == -1 else next_header + 1
+        yield _index_record(mm, name, min(line_end + 1, size), seq_end)
+        pos = seq_end
+
+
+def build_fai(path: str, fai: Optional[str] = None) -> List[FaiRecord]:
+    """
+    建立索引, fai 不为空时写出
+
+    :param path: 未压缩 fasta
+    :param fai: 索引输出路径, 通常为 path + '.fai'
+    """
+    fmt = detect_format(path)
+    if fmt != "plain":
+        raise ValueError(f"{path} is {fmt} compressed, random access needs an uncompressed fasta")
+    if os.path.getsize(path) == 0:
+        records = []
+    else:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            records = list(iter_records(mm))
+    names = set()
+    for record in records:
+        if record.name in names:
+            raise ValueError(f"duplicate sequence name '{record.name}' in {path}")
+        names.add(record.name)
+    if fai:
+        with open(fai, "w") as f:
+            f.writelines(record.to_line() + "\n" for record in records)
+    return records
+
+
+def read_fai(fai: str) -> List[FaiRecord]:
+    records = []
+    with open(fai) as f:
+        for line in f:
+            columns = line.rstrip("\r\n").split("\t")
+            if len(columns) >= 5:
+                records.append(FaiRecord(columns[0], *map(int, columns[1:5])))
+    return records
+
+
+def load_fai(path: str, fai: Optional[str] = None, write: bool = True) -> List[FaiRecord]:
+    """读取索引; 索引不存在或比 fasta 旧时重新建立, write 为真时尝试写出 (目录不可写时只保留在内存中)"""
+    fai = fai or path + ".fai"
+    if os.path.isfile(fai) and os.path.getmtime(fai) >= os.path.getmtime(path):
+        return read_fai(fai)
+    records = build_fai(path)
+    if write:
+        try:
+            with open(fai, "w") as f:
+                f.writelines(record.to_line() + "\n" for record in records)
+        except OSError:
+            pass
+    return records
+
+
+class FastaReader:
+    """
+    :param path: 未压缩 fasta
+    :param fai: 索引路径, 默认 path + '.fai'
+    :param write_fai: 索引不存在时是否写出
+    """
+
+    def __init__(self, path: str, fai: Optional[str] = None, write_fai: bool = True):
+        self.path = path
+        self.index: Dict[str, FaiRecord] = {r.name: r for r in load_fai(path, fai, write_fai)}
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.index else b""
+
+    @property
+    def references(self) -> List[str]:
+        return list(self.index)
+
+    @property
+    def lengths(self) -> List[int]:
+        return [r.length for r in self.index.values()]
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get_length(self, name: str) -> int:
+        return self.index[name].length
+
+    def fetch_bytes(self, name: str, start: int = 0, end: Optional[int] = None, strand: str = "+") -> bytes:
+        """
+        取 [start, end) 区间 (0-based), end 超出序列长度时截断到序列末尾;
+        只复制区间所在的字节, strand 为 '-' 时返回反向互补序列
+        """
+        try:
+            record = self.index[name]
+        except KeyError:
+            raise KeyError(f"sequence '{name}' not found in {self.path}") from None
+        end = record.length if end is None else min(end, record.length)
+        if start < 0 or start > end:
+            raise ValueError(f"invalid region {name}:{start}-{end}")
+        if start == end:
+            return b""
+        lb, lw = record.linebases, record.linewidth
+        first = record.offset + start // lb * lw + start % lb
+        last = record.offset + (end - 1) // lb * lw + (end - 1) % lb + 1
+        seq = self._mm[first:last]
+        if last - first != end - start:
+            seq = seq.translate(None, b"\r\n")
+        if strand == "-":
+            seq = seq.translate(COMPLEMENT)[::-1]
+        elif strand not in ("+", "."):
+            raise ValueError(f"invalid strand '{strand}', should be + or -")
+        return seq
+
+    def fetch(self, name: str, start: int = 0, end: Optional[int] = None, strand: str = "+") -> str:
+        return self.fetch_bytes(name, start, end, strand).decode("ascii")
+
+    def close(self) -> None:
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def open_fasta(path: str, fai: Optional[str] = None) -> FastaReader:
+    """同一文件多次调用返回已打开的对象, 多次查询无需重复打开文件及读取索引"""
+    key = os.path.abspath(path)
+    reader = _READERS.get(key)
+    if reader is None or reader._file.closed:
+        reader = _READERS[key] = FastaReader(path, fai)
+    return reader
+
+
+def close_all() -> None:
+    for reader in _READERS.values():
+        reader.close()
+    _READERS.clear()
+
+
+atexit.register(close_all)
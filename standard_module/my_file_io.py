@@ -0,0 +1,324 @@
+"""
+通用文件读写:
+1. 依据魔数识别 plain/gzip/bgzf/bz2/xz 输入, 与文件后缀无关;
+2. 大缓冲区按字节读取行, 需要时再解码;
+3. 带缓冲区的压缩写出, bgzf 支持多线程压缩/解压
+"""
+import io
+import os
+import gzip
+import zlib
+import struct
+import collections
+from typing import IO, Iterator, Optional
+
+BUFFER_SIZE = 1 << 20  # 1M
+
+MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+}
+SUFFIX = {
+    ".gz": "bgzf",  # bgzf 兼容 gzip, 写出时默认使用 bgzf 以便建立索引
+    ".bgz": "bgzf",
+    ".bz2": "bz2",
+    ".xz": "xz",
+}
+
+BGZF_BLOCK = 0xFF00  # 与 htslib 一致, 保证压缩后的块不超过 64k
+BGZF_HEADER = b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00"
+BGZF_EOF = BGZF_HEADER + b"\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+
+
+def detect_format(path: str) -> str:
+    """
+    依据文件头识别压缩格式
+
+    :return: "plain", "gzip", "bgzf", "bz2" 或 "xz"
+    """
+    with open(path, "rb") as f:
+        header = f.read(18)
+    if header.startswith(MAGIC["gzip"]):
+        # gzip 头部 FLG.FEXTRA 置位且包含 BC 子字段
+        if len(header) == 18 and header[3] == 4 and header[12:14] == b"BC":
+            return "bgzf"
+        return "gzip"
+    for name in ("bz2", "xz"):
+        if header.startswith(MAGIC[name]):
+            return name
+    return "plain"
+
+
+def guess_compress(path: str) -> Optional[str]:
+    """依据输出文件后缀确定压缩格式, 无压缩时返回 None"""
+    return SUFFIX.get(os.path.splitext(path)[1].lower())
+
+
+def _inflate_block(block: bytes) -> bytes:
+    data = zlib.decompress(block[:-8], -15)
+    crc, size = struct.unpack("<II", block[-8:])
+    if zlib.crc32(data) != crc or len(data) != size:
+        raise ValueError("BGZF block CRC mismatch")
+    return data
+
+
+def _deflate_block(data: bytes, level: int = 6) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    return b"".join(
+        [
+            BGZF_HEADER,
+            struct.pack("<H", len(cdata) + 25),
+            cdata,
+            struct.pack("<II", zlib.crc32(data), len(data)),
+        ]
+    )
+
+
+class BgzfReader(io.RawIOBase):
+    """
+    多线程解压 bgzf: 依据块头的 BSIZE 切分出相互独立的压缩块, 在线程池中解压
+    (zlib 解压时释放 GIL), 按原顺序输出; 同时在解压的块数受限, 内存占用有上限
+    """
+
+    def __init__(self, path: str, threads: int):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._file = open(path, "rb")
+        self._threads = threads
+        self._pool = ThreadPoolExecutor(threads)
+        self._data = self._iter_data()
+        self._buffer = b""
+        self._pos = 0
+
+    def _iter_blocks(self):
+        while True:
+            header = self._file.read(12)
+            if not header:
+                return
+            if len(header) < 12 or header[:4] != b"\x1f\x8b\x08\x04":
+                raise ValueError("Invalid BGZF block header")
+            xlen = struct.unpack("<H", header[10:12])[0]
+            extra = self._file.read(xlen)
+            bsize, i = None, 0
+            while i + 4 <= len(extra):
+                slen = struct.unpack("<H", extra[i + 2 : i + 4])[0]
+                if extra[i : i + 2] == b"BC":
+                    bsize = struct.unpack("<H", extra[i + 4 : i + 6])[0]
+                i += 4 + slen
+            if bsize is None:
+                raise ValueError("Invalid BGZF block header")
+            yield self._file.read(bsize + 1 - 12 - xlen)
+
+    def _iter_data(self):
+        pending = collections.deque()
+        for block in self._iter_blocks():
+            pending.append(self._pool.submit(_inflate_block, block))
+            if len(pending) >= self._threads * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._pos >= len(self._buffer):
+            self._buffer = next(self._data, None)
+            self._pos = 0
+            if self._buffer is None:
+                self._buffer = b""
+                return 0
+        size = min(len(b), len(self._buffer) - self._pos)
+        b[:size] = self._buffer[self._pos : self._pos + size]
+        self._pos += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._pool.shutdown(cancel_futures=True)
+            self._file.close()
+        super().close()
+
+
+class BgzfWriter(io.RawIOBase):
+    """
+    写出 bgzf: 按 BGZF_BLOCK 大小切块压缩, 多线程时在线程池中压缩, 按原顺序写出,
+    结尾写入 EOF 块, 可直接用 tabix 建立索引
+    """
+
+    def __init__(self, path: str, threads: int = 1, level: int = 6):
+        self._file = open(path, "wb")
+        self._threads = threads
+        self._level = level
+        self._pool = None
+        if threads > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._pool = ThreadPoolExecutor(threads)
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def _write_block(self, data):
+        if self._pool is None:
+            self._file.write(_deflate_block(data, self._level))
+            return
+        self._pending.append(self._pool.submit(_deflate_block, data, self._level))
+        if len(self._pending) >= self._threads * 4:
+            self._file.write(self._pending.popleft().result())
+
+    def write(self, b):
+        self._buffer += b
+        if len(self._buffer) >= BGZF_BLOCK:
+            view = memoryview(self._buffer)
+            end = len(self._buffer) - len(self._buffer) % BGZF_BLOCK
+            for i in range(0, end, BGZF_BLOCK):
+                self._write_block(bytes(view[i : i + BGZF_BLOCK]))
+            view.release()
+            del self._buffer[:end]
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            if self._buffer:
+                self._write_block(bytes(self._buffer))
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+            if self._pool:
+                self._pool.shutdown()
+            self._file.write(BGZF_EOF)
+            self._file.close()
+        super().close()
+
+
+def open_input(
+    path: str,
+    text: bool = True,
+    threads: int = 1,
+    buffer_size: int = BUFFER_SIZE,
+    encoding: Optional[str] = None,
+) -> IO:
+    """
+    打开输入文件, 依据魔数自动解压; bgzf 且多线程时并行解压
+
+    :param path: 输入文件路径
+    :param text: True 返回文本流 (换行符统一为 \\n), False 返回字节流
+    :param threads: bgzf 解压线程数
+    :param buffer_size: 读取缓冲区大小
+    :param encoding: 文本编码, 默认与 open 一致
+    """
+    fmt = detect_format(path)
+    if fmt == "plain":
+        if text:
+            return open(path, "r", buffering=buffer_size, encoding=encoding)
+        return open(path, "rb", buffering=buffer_size)
+    if fmt == "bgzf" and threads > 1:
+        stream = io.BufferedReader(BgzfReader(path, threads), buffer_size)
+    elif fmt in ("gzip", "bgzf"):
+        stream = io.BufferedReader(gzip.open(path, "rb"), buffer_size)
+    elif fmt == "bz2":
+        import bz2  # bz2/lzma 只在需要时导入, 减少启动时间
+
+        stream = io.BufferedReader(bz2.open(path, "rb"), buffer_size)
+    else:
+        import lzma
+
+        stream = io.BufferedReader(lzma.open(path, "rb"), buffer_size)
+    return io.TextIOWrapper(stream, encoding=encoding) if text else stream
+
+
+def open_output(
+    path: str,
+    compress: Optional[str] = None,
+    text: bool = True,
+    threads: int = 1,
+    buffer_size: int = BUFFER_SIZE,
+    level: int = 6,
+    encoding: Optional[str] = None,
+) -> IO:
+    """
+    打开输出文件
+
+    :param path: 输出文件路径
+    :param compress: None, "gzip", "bgzf", "bz2", "xz"; "auto" 时依据后缀确定
+    :param text: True 返回文本流, False 返回字节流
+    :param threads: bgzf 压缩线程数
+    :param buffer_size: 写出缓冲区大小
+    :param level: 压缩级别 (xz 为 preset)
+    """
+    if compress == "auto":
+        compress = guess_compress(path)
+    if compress is None:
+        if text:
+            return open(path, "w", buffering=buffer_size, encoding=encoding)
+        return open(path, "wb", buffering=buffer_size)
+    if compress == "bgzf":
+        raw = BgzfWriter(path, threads, level)
+    elif compress == "gzip":
+        raw = gzip.open(path, "wb", compresslevel=level)
+    elif compress == "bz2":
+        import bz2
+
+        raw = bz2.open(path, "wb", compresslevel=max(level, 1))
+    elif compress == "xz":
+        import lzma
+
+        raw = lzma.open(path, "wb", preset=level)
+    else:
+        raise ValueError(f"Unsupported compress format: {compress}")
+    stream = io.BufferedWriter(raw, buffer_size)
+    return io.TextIOWrapper(stream, encoding=encoding) if text else stream
+
+
+def decode_line(line: bytes, encoding: str = "utf-8") -> str:
+    """与文本模式读取一致, 将 \\r\\n 转换为 \\n"""
+    line = line.decode(encoding)
+    if line.endswith("\r\n"):
+        line = line[:-2] + "\n"
+    return line
+
+
+def iter_lines(
+    path: str,
+    decode: bool = False,
+    threads: int = 1,
+    buffer_size: int = BUFFER_SIZE,
+    encoding: str = "utf-8",
+) -> Iterator:
+    """
+    逐行读取 (含换行符); 默认产出 bytes, 由调用方只解码需要的行,
+    decode=True 时产出 str
+    """
+    with open_input(path, text=False, threads=threads, buffer_size=buffer_size) as f:
+        if decode:
+            for line in f:
+                yield decode_line(line, encoding)
+        else:
+            yield from f
+
+
+def iter_blocks(
+    path: str, block_size: int = BUFFER_SIZE, threads: int = 1
+) -> Iterator[bytes]:
+    """
+    按块读取, 每块以完整的行结尾 (最后一块可能无换行符);
+    适合 bytes.count/split 等批量处理, 避免逐行的 python 开销
+    """
+    with open_input(path, text=False, threads=threads, buffer_size=block_size) as f:
+        rest = b""
+        while True:
+            chunk = f.read(block_size)
+            if not chunk:
+                break
+            end = chunk.rfind(b"\n") + 1
+            if end == 0:
+                rest += chunk
+                continue
+            yield rest + chunk[:end]
+            rest = chunk[end:]
+        if rest:
+            yield rest
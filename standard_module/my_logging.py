@@ -1,38 +1,133 @@
+import json
+import time
+import queue
+import atexit
 import logging
-from typing import Optional
+import threading
+from typing import Dict, Optional
+from logging.handlers import QueueHandler, QueueListener
+
+
+# 已配置的日志记录器及其后台监听线程, 保证 setup_logger 重复调用不会叠加处理程序
+_LISTENERS: Dict[str, QueueListener] = {}
+_LOCK = threading.Lock()
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 json, 便于程序解析"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "name": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class DebugThrottle(logging.Filter):
+    """
+    限制 DEBUG 及以下级别日志的数量, 其他级别不受影响;
+    rate: 每秒最多输出条数 (令牌桶); sample: 每 N 条保留 1 条
+    """
+
+    def __init__(self, rate: Optional[float] = None, sample: Optional[int] = None):
+        super().__init__()
+        self.rate = rate
+        self.sample = sample
+        self.count = 0
+        self.tokens = rate or 0.0
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        with self.lock:
+            self.count += 1
+            if self.sample and (self.count - 1) % self.sample:
+                return False
+            if self.rate:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens < 1:
+                    return False
+                self.tokens -= 1
+        return True
 
 
 # pylint: disable=no-member
 def setup_logger(
-    name: str, log_file: Optional[str] = None, level: int = logging.INFO
+    name: str,
+    log_file: Optional[str] = None,
+    level: int = logging.INFO,
+    json_format: bool = False,
+    debug_rate: Optional[float] = None,
+    debug_sample: Optional[int] = None,
 ) -> logging.Logger:
-    """To setup logger"""
-    # 创建日志记录器
+    """
+    To setup logger;
+    调用线程只将日志放入队列, 格式化及写入由后台 QueueListener 线程完成;
+    同名 logger 重复调用直接返回, 仅更新日志级别
+
+    :param name: 日志记录器名称
+    :param log_file: 日志文件, 为空时输出到控制台
+    :param level: 日志级别
+    :param json_format: 以 json lines 格式输出
+    :param debug_rate: DEBUG 日志每秒最多输出条数
+    :param debug_sample: DEBUG 日志每 N 条保留 1 条
+    """
     logger = logging.getLogger(name)
     logger.setLevel(level)
+    with _LOCK:
+        if name in _LISTENERS:
+            return logger
 
-    # 创建控制台处理程序, 并设级别为DEBUG
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.DEBUG)
+        if log_file:
+            # 创建文件处理程序, 并设置级别为INFO
+            handler = logging.FileHandler(log_file, mode="a", encoding="utf-8")
+            handler.setLevel(logging.INFO)
+        else:
+            # 创建控制台处理程序, 并设级别为DEBUG
+            handler = logging.StreamHandler()
+            handler.setLevel(logging.DEBUG)
+        handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
 
-    # 创建文件处理程序, 并设置级别为INFO
-    if log_file:
-        file_handler = logging.FileHandler(log_file, mode="a", encoding="utf-8")
-        file_handler.setLevel(logging.INFO)
+        log_queue: queue.Queue = queue.Queue(-1)
+        queue_handler = QueueHandler(log_queue)
+        if debug_rate or debug_sample:
+            # 在调用线程过滤, 被丢弃的日志不进入队列
+            queue_handler.addFilter(DebugThrottle(debug_rate, debug_sample))
+        listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        listener.start()
 
-        # 创建日志格式
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
-        console_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+        _LISTENERS[name] = listener
+    return logger
 
-        # 将处理程序添加到日志记录器
-        logger.addHandler(file_handler)
-    else:
-        logger.addHandler(console_handler)
 
-    return logger
+def shutdown_loggers() -> None:
+    """停止所有后台线程, 写出队列中剩余的日志; 程序退出时自动调用"""
+    with _LOCK:
+        for name, listener in _LISTENERS.items():
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+            logger = logging.getLogger(name)
+            for handler in list(logger.handlers):
+                if isinstance(handler, QueueHandler):
+                    logger.removeHandler(handler)
+        _LISTENERS.clear()
+
+
+atexit.register(shutdown_loggers)
 
 
 def _some_function() -> None:
@@ -53,12 +148,26 @@ def _another_function() -> None:
     logger.info("Info message from module2")
 
 
+def _throttle_function() -> None:
+    """
+    test3
+    """
+    logger = setup_logger(
+        "module3_logger", level=logging.DEBUG, json_format=True, debug_sample=100
+    )
+    for i in range(1000):
+        logger.debug("Debug message %d from module3", i)
+    logger.info("Info message from module3")
+
+
 def main() -> None:
     """
     test
     """
     _some_function()
+    _some_function()
     _another_function()
+    _throttle_function()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+"""
+按记录边界将大文件切分为字节区间, 多进程分别处理, 按原顺序合并结果;
+仅支持未压缩文件 (压缩文件无法按字节偏移读取)
+
+usage:
+    def count(path, shard, key):
+        n = 0
+        for line in read_range(path, shard):
+            n += key in line
+        return n
+
+    executor = ShardExecutor(workers=4)
+    total = executor.map_reduce("big.txt", count, operator.add, 0, b"chr1")
+"""
+import os
+import collections
+import multiprocessing
+from typing import Callable, Iterator, List, NamedTuple, Optional
+
+SHARDS_PER_WORKER = 4  # 每个进程分配多个区间, 减少区间大小不均导致的等待
+
+
+class Shard(NamedTuple):
+    index: int
+    start: int
+    end: int
+
+
+def split_ranges(
+    path: str,
+    shards: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    boundary: Optional[Callable[[bytes], bool]] = None,
+) -> List[Shard]:
+    """
+    将文件切分为约 shards 个 (或每个约 chunk_size 字节的) 区间,
+    区间起点对齐到行首; 指定 boundary 时继续向后对齐到 boundary(line) 为真的行,
+    例如 gff 的 gene 行, 保证一条记录不会被拆到两个区间
+
+    :param path: 未压缩文件路径
+    :param shards: 区间数
+    :param chunk_size: 每个区间的字节数, 与 shards 二选一
+    :param boundary: 判断一行是否为记录起点, 参数为 bytes 行
+    """
+    size = os.path.getsize(path)
+    if chunk_size:
+        shards = -(-size // chunk_size)
+    shards = max(shards or 1, 1)
+    points = [0]
+    with open(path, "rb") as f:
+        for i in range(1, shards):
+            pos = max(size * i // shards, points[-1])
+            if pos >= size:
+                break
+            f.seek(pos)
+            pos += len(f.readline())  # 跳到下一行行首
+            if boundary is not None:
+                for line in f:
+                    if boundary(line):
+                        break
+                    pos += len(line)
+            points.append(min(pos, size))
+    points.append(size)
+    ranges = [(start, end) for start, end in zip(points, points[1:]) if end > start]
+    return [Shard(i, start, end) for i, (start, end) in enumerate(ranges)]
+
+
+def iter_range(f, start: int, end: int) -> Iterator[bytes]:
+    """逐行读取已打开的二进制文件 [start, end) 字节区间"""
+    f.seek(start)
+    offset = start
+    for line in f:
+        if offset >= end:
+            break
+        offset += len(line)
+        yield line
+
+
+def read_range(path: str, shard: Shard, buffer_size: int = 1 << 20) -> Iterator[bytes]:
+    """逐行读取文件中的一个区间"""
+    with open(path, "rb", buffering=buffer_size) as f:
+        yield from iter_range(f, shard.start, shard.end)
+
+
+def _call(task):
+    func, path, shard, args = task
+    return func(path, shard, *args)
+
+
+class ShardExecutor:
+    """
+    :param workers: 进程数, 为 1 时在当前进程中依次处理
+    :param shards: 区间数, 默认 workers * SHARDS_PER_WORKER
+    :param chunk_size: 每个区间的字节数, 指定时忽略 shards
+    :param boundary: 记录起点判断函数, 见 split_ranges
+    :param prefetch: 同时提交的区间数上限, 默认 workers * 2; 限制未被取走的结果占用的内存
+    :param initializer: 进程初始化函数, 可用于传入只需发送一次的大对象
+    :param initargs: initializer 的参数
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        shards: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        boundary: Optional[Callable[[bytes], bool]] = None,
+        prefetch: Optional[int] = None,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = (),
+    ):
+        self.workers = max(workers, 1)
+        self.shards = shards or self.workers * SHARDS_PER_WORKER
+        self.chunk_size = chunk_size
+        self.boundary = boundary
+        self.prefetch = max(prefetch or self.workers * 2, 1)
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def split(self, path: str) -> List[Shard]:
+        return split_ranges(path, self.shards, self.chunk_size, self.boundary)
+
+    def map(self, path: str, func: Callable, *args) -> Iterator:
+        """
+        对每个区间调用 func(path, shard, *args), 按区间顺序逐个产出结果;
+        func 及 args 需可被 pickle (模块顶层函数)
+        """
+        shards = self.split(path)
+        if self.workers == 1 or len(shards) == 1:
+            if self.initializer is not None:
+                self.initializer(*self.initargs)
+            for shard in shards:
+                yield func(path, shard, *args)
+            return
+        with multiprocessing.Pool(
+            min(self.workers, len(shards)), self.initializer, self.initargs
+        ) as pool:
+            pending = collections.deque()
+            for shard in shards:
+                pending.append(pool.apply_async(_call, ((func, path, shard, args),)))
+                if len(pending) >= self.prefetch:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+
+    def map_reduce(self, path: str, func: Callable, reduce: Callable, initial, *args):
+        """按区间顺序依次合并结果: result = reduce(result, func(path, shard, *args))"""
+        result = initial
+        for value in self.map(path, func, *args):
+            result = reduce(result, value)
+        return result
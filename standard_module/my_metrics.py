@@ -0,0 +1,198 @@
+"""
+运行指标统计: 分阶段计时, 行/字节吞吐量, 峰值内存;
+未开启时 stage() 返回共享的空对象, 热点代码中几乎无额外开销
+
+usage:
+    parser = argparse.ArgumentParser()
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    metrics = metrics_from_args(args, "tool_name")
+    with metrics.stage("parse") as stage:
+        ...
+        stage.add(lines=n, nbytes=size)
+    metrics.close()
+"""
+import os
+import sys
+import json
+import time
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """进程 (或已结束的子进程) 的峰值内存, MB"""
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    # ru_maxrss 在 linux 下单位为 KB, macOS 下为 byte
+    peak = resource.getrusage(who).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return round(peak / 1024 / 1024, 2)
+
+
+def current_rss_mb() -> Optional[float]:
+    """当前内存, 仅 linux (/proc/self/statm)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 2)
+
+
+class Stage:
+    """单个阶段的耗时、处理量及结束时的内存"""
+
+    __slots__ = ("name", "seconds", "lines", "bytes", "rss_mb", "peak_rss_mb", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.lines = 0
+        self.bytes = 0
+        self.rss_mb = None
+        self.peak_rss_mb = None
+        self._start = None
+
+    def add(self, lines: int = 0, nbytes: int = 0) -> None:
+        self.lines += lines
+        self.bytes += nbytes
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds += time.perf_counter() - self._start
+        self.rss_mb = current_rss_mb()
+        self.peak_rss_mb = peak_rss_mb()
+        return False
+
+    def to_dict(self) -> dict:
+        data = {"seconds": round(self.seconds, 4)}
+        if self.lines:
+            data["lines"] = self.lines
+            data["lines_per_second"] = round(self.lines / self.seconds, 1) if self.seconds else None
+        if self.bytes:
+            data["bytes"] = self.bytes
+            data["mb_per_second"] = (
+                round(self.bytes / 1024 / 1024 / self.seconds, 2) if self.seconds else None
+            )
+        data["rss_mb"] = self.rss_mb
+        data["peak_rss_mb"] = self.peak_rss_mb
+        return data
+
+
+class _NullStage:
+    """未开启统计时使用, 所有操作均为空"""
+
+    __slots__ = ()
+
+    def add(self, lines: int = 0, nbytes: int = 0) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class Metrics:
+    """
+    :param name: 工具名称, 写入 json
+    :param profile: 结束时将各阶段统计打印到标准错误
+    :param json_path: 结束时将统计写入 json 文件
+    """
+
+    def __init__(self, name: str, profile: bool = False, json_path: Optional[str] = None):
+        self.name = name
+        self.profile = profile
+        self.json_path = json_path
+        self.enabled = profile or bool(json_path)
+        self.stages = {}
+        self._start = time.perf_counter()
+
+    def stage(self, name: str):
+        """同名阶段多次进入时累加"""
+        if not self.enabled:
+            return NULL_STAGE
+        if name not in self.stages:
+            self.stages[name] = Stage(name)
+        return self.stages[name]
+
+    def counted(self, iterable, name: str):
+        """统计迭代产出的条目数 (记为阶段的 lines), 未开启时原样返回"""
+        if not self.enabled:
+            return iterable
+        stage = self.stage(name)
+
+        def count():
+            for item in iterable:
+                stage.lines += 1
+                yield item
+
+        return count()
+
+    def report(self) -> dict:
+        return {
+            "tool": self.name,
+            "argv": sys.argv[1:],
+            "seconds": round(time.perf_counter() - self._start, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(children=True),
+            "stages": {name: stage.to_dict() for name, stage in self.stages.items()},
+        }
+
+    def close(self) -> None:
+        if not self.enabled:
+            return
+        report = self.report()
+        if self.profile:
+            print(
+                f"[{self.name}] total {report['seconds']}s, peak rss {report['peak_rss_mb']} MB",
+                file=sys.stderr,
+            )
+            for name, stage in report["stages"].items():
+                info = ", ".join(f"{k}={v}" for k, v in stage.items())
+                print(f"[{self.name}]   {name}: {info}", file=sys.stderr)
+        if self.json_path:
+            with open(self.json_path, "w") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+
+
+def add_metrics_arguments(parser) -> None:
+    """为命令行添加 --profile 及 --metrics-json 参数"""
+    group = parser.add_argument_group("Metrics parameters", "Time/throughput/memory of each stage")
+    group.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="print time, throughput and peak memory of each stage to stderr",
+    )
+    group.add_argument(
+        "--metrics-json",
+        dest="metrics_json",
+        default=None,
+        help="write time, throughput and peak memory of each stage to this json file",
+    )
+
+
+def metrics_from_args(args, name: str) -> Metrics:
+    return Metrics(name, getattr(args, "profile", False), getattr(args, "metrics_json", None))
+
+
+def file_size(path: str) -> int:
+    """输入文件大小, 用于计算字节吞吐量; 文件不存在时为 0"""
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0